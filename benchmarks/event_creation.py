@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures event creation throughput with each of the available event id generators.
+
+Usage:
+    python benchmarks/event_creation.py [count]
+"""
+
+import sys
+
+from timeit import timeit
+
+from compysition.event import Event, LogEvent, CounterIDGenerator, UUIDGenerator, set_id_generator
+
+
+def main(count=100000):
+    cases = (
+        ("id only", lambda generator: generator),
+        ("Event", lambda generator: Event),
+        ("LogEvent", lambda generator: lambda: LogEvent("info", "actor", "message")),
+    )
+
+    print "{0:<12}{1:>26}{2:>26}".format("", "UUIDGenerator (/s)", "CounterIDGenerator (/s)")
+    for name, factory in cases:
+        rates = []
+        for generator in (UUIDGenerator(), CounterIDGenerator()):
+            set_id_generator(generator)
+            rates.append(count / timeit(factory(generator), number=count))
+        print "{0:<12}{1:>26.0f}{2:>26.0f}".format(name, *rates)
+
+    set_id_generator(CounterIDGenerator())
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the per-instance memory footprint of the slotted compysition events against an equivalent dictionary
+based event, which is how events were stored before Event defined __slots__.
+
+Usage:
+    python benchmarks/event_memory.py [count]
+"""
+
+import gc
+import sys
+
+from uuid import uuid4 as uuid
+from datetime import datetime
+
+from compysition.event import Event, JSONEvent, HttpEvent, JSONHttpEvent, DEFAULT_EVENT_SERVICE
+
+
+class DictEvent(object):
+    """The attribute layout of an event without __slots__"""
+
+    def __init__(self, data=None, **kwargs):
+        self._event_id = uuid().get_hex()
+        self.meta_id = self._event_id
+        self.service = DEFAULT_EVENT_SERVICE
+        self._data = data
+        self._error = None
+        self.created = datetime.now()
+        self.__dict__.update(kwargs)
+
+
+class DictHttpEvent(DictEvent):
+
+    def __init__(self, headers=None, status=(200, "OK"), environment={}, pagination=None, **kwargs):
+        self.headers = headers or {}
+        self.method = environment.get('REQUEST_METHOD', None)
+        self._status = status
+        self.environment = environment
+        self._pagination = pagination
+        super(DictHttpEvent, self).__init__(**kwargs)
+
+
+def sizeof(obj, seen):
+    """The size of obj and every object it references that is not already in seen. Classes are not counted"""
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    return sys.getsizeof(obj) + sum(sizeof(referent, seen) for referent in gc.get_referents(obj))
+
+
+def measure(factory, count):
+    # Objects shared between all events (interned strings, default arguments, class attributes) are not counted
+    seen = set(id(value) for value in (None, DEFAULT_EVENT_SERVICE, (200, "OK"), HttpEvent.__init__.__defaults__[2]))
+    events = [factory() for _ in xrange(count)]
+    return sum(sizeof(event, seen) for event in events) / float(count)
+
+
+def main(count=10000):
+    cases = (
+        ("Event", lambda: DictEvent(), lambda: Event()),
+        ("Event with kwargs", lambda: DictEvent(foo="bar"), lambda: Event(foo="bar")),
+        ("JSONEvent", lambda: DictEvent(data={}), lambda: JSONEvent()),
+        ("HttpEvent", lambda: DictHttpEvent(), lambda: HttpEvent()),
+        ("JSONHttpEvent", lambda: DictHttpEvent(data={}), lambda: JSONHttpEvent()),
+    )
+
+    print "{0:<20}{1:>14}{2:>14}{3:>10}".format("event", "dict (bytes)", "slots (bytes)", "saved")
+    for name, dict_factory, slot_factory in cases:
+        dict_size = measure(dict_factory, count)
+        slot_size = measure(slot_factory, count)
+        print "{0:<20}{1:>14.0f}{2:>14.0f}{3:>9.0f}%".format(name, dict_size, slot_size, 100 * (1 - slot_size / dict_size))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares assigning dicts to JSON event data through normalize_json against the previous
+json.loads(json.dumps()) round trip, for a small static value and for a payload of 100 records.
+
+Usage:
+    python benchmarks/json_normalize.py
+"""
+
+import json
+from timeit import repeat
+
+from compysition.event import normalize_json, decimal_default
+
+
+def build_records(count):
+    return {u"records": [{u"id": index, u"name": u"Record {0}".format(index), u"amount": index + .5,
+                          u"tags": [u"alpha", u"beta"], u"active": True} for index in xrange(count)]}
+
+
+def round_trip(data):
+    return json.loads(json.dumps(data, default=decimal_default))
+
+
+def main():
+    print "{0:<10}{1:>20}{2:>20}{3:>10}".format("data", "round trip (s)", "normalize_json (s)", "speedup")
+    for name, data, number in (("static", {u"status": {u"code": 200}}, 20000), ("records", build_records(100), 200)):
+        old = min(repeat(lambda: round_trip(data), number=number, repeat=5)) / number
+        new = min(repeat(lambda: normalize_json(data), number=number, repeat=5)) / number
+        print "{0:<10}{1:>20.6f}{2:>20.6f}{3:>9.1f}x".format(name, old, new, old / new)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares XML to JSON event data conversion through etree_to_dict against the previous
+etree.tostring -> xmltodict.parse round trip, on documents of roughly 1 KB, 100 KB and 10 MB.
+
+Usage:
+    python benchmarks/xml_to_dict.py
+"""
+
+from timeit import timeit
+from xml.parsers import expat
+
+import xmltodict
+from lxml import etree
+
+from compysition.event import etree_to_dict, should_force_list, remove_internal_xmlify
+
+RECORD = """<record id="{0}" force_list="True">
+    <name>Record {0}</name>
+    <amount currency="USD">{0}.50</amount>
+    <tags><tag>alpha</tag><tag>beta</tag></tags>
+    <note>Some longer free text that describes record number {0} &amp; its contents</note>
+</record>"""
+
+
+def build_document(size):
+    records = []
+    length = 0
+    index = 0
+    while length < size:
+        record = RECORD.format(index)
+        records.append(record)
+        length += len(record)
+        index += 1
+    return etree.fromstring("<records>{0}</records>".format("".join(records)))
+
+
+def tostring_parse(element):
+    return remove_internal_xmlify(xmltodict.parse(etree.tostring(element), expat=expat, force_list=should_force_list))
+
+
+def direct(element):
+    return remove_internal_xmlify(etree_to_dict(element, force_list=should_force_list))
+
+
+def main():
+    print "{0:<10}{1:>20}{2:>20}{3:>10}".format("document", "tostring+parse (s)", "etree_to_dict (s)", "speedup")
+    for name, size, number in (("1 KB", 1024, 2000), ("100 KB", 100 * 1024, 20), ("10 MB", 10 * 1024 * 1024, 1)):
+        element = build_document(size)
+        old = timeit(lambda: tostring_parse(element), number=number) / number
+        new = timeit(lambda: direct(element), number=number) / number
+        print "{0:<10}{1:>20.6f}{2:>20.6f}{3:>9.1f}x".format(name, old, new, old / new)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,8 +25,10 @@
 import traceback
 import abc
 
+from time import time
 from gevent import sleep
 from gevent.event import Event as GEvent
+from gevent.lock import BoundedSemaphore
 from copy import deepcopy
 
 from compysition.queue import QueuePool
@@ -34,6 +36,8 @@ from compysition.logger import Logger
 from compysition.errors import (QueueConnected, InvalidActorOutput, QueueEmpty, InvalidEventConversion, 
     InvalidActorInput, QueueFull)
 from compysition.restartlet import RestartPool
+from compysition.rescue import RescueScheduler
+from compysition.metrics import ActorMetrics
 from compysition.event import Event
 
 class Actor(object):
@@ -60,7 +64,16 @@ class Actor(object):
             blocking_consume=False,
             rescue=False,
             max_rescue=5,
+            rescue_delay=1,
+            rescue_backoff=2,
+            rescue_max_delay=60,
+            rescue_jitter=0.5,
+            rescue_budget=0,
             convert_output=False,
+            copy_on_write=False,
+            max_in_flight=0,
+            batch_size=1,
+            batch_timeout=0,
             *args,
             **kwargs):
         """
@@ -78,6 +91,48 @@ class Actor(object):
                 | it should execute 'consume' and block until that 'consume' is complete. This is usually
                 | only necessary if executing work on an event in the order that it was received is critical.
                 | (Default: False)
+            rescue (Optional[bool]):
+                | Define if an event that raised an exception during 'consume' should be put back on its origin queue and retried,
+                | rather than being sent to the error queues
+                | (Default: False)
+            max_rescue (Optional[int]):
+                | The max amount of times a single event may be retried before it is sent to the error queues
+                | (Default: 5)
+            rescue_delay (Optional[float]):
+                | The time (in seconds) a rescued event waits before its first retry. Waiting events are held by a
+                | scheduler rather than by a consuming greenlet
+                | (Default: 1)
+            rescue_backoff (Optional[float]):
+                | The factor the rescue delay is multiplied by on every following retry of the same event
+                | (Default: 2)
+            rescue_max_delay (Optional[float]):
+                | The upper bound of the delay between two retries of an event
+                | (Default: 60)
+            rescue_jitter (Optional[float]):
+                | The fraction (0 to 1) of each rescue delay that is randomized, so that events failing together do not retry in lockstep
+                | (Default: 0.5)
+            rescue_budget (Optional[int]):
+                | The max amount of events this actor may hold for a retry at once. Failed events beyond the budget are sent
+                | to the error queues. A value of 0 represents no limit
+                | (Default: 0)
+            copy_on_write (Optional[bool]):
+                | Define if outgoing events should be sent without a deepcopy. An event sent to a single queue is passed through as-is,
+                | and an event sent to multiple queues is forked, sharing event.data between the forks until one of them
+                | accesses or modifies it. Only enable this if 'consume' does not modify an event after it has been sent
+                | (Default: False)
+            max_in_flight (Optional[int]):
+                | The max amount of events this actor may consume concurrently. Once every slot is busy, no further events are
+                | pulled from the inbound queues until a 'consume' execution completes. A value of 0 represents no limit.
+                | Ignored if blocking_consume is True
+                | (Default: 0)
+            batch_size (Optional[int]):
+                | The max amount of events pulled from an inbound queue per wakeup. If greater than 1, the pulled events are
+                | passed together to 'consume_batch' rather than individually to 'consume'
+                | (Default: 1)
+            batch_timeout (Optional[float]):
+                | The time (in seconds) to wait for a batch to fill up to batch_size once its first event has been received.
+                | A value of 0 only drains the events already waiting on the queue
+                | (Default: 0)
 
         """
         self.blockdiag_config = {"shape": "box"}
@@ -92,10 +147,22 @@ class Actor(object):
         self.__block = self._async_class()
         self._clear_all()
         self.__blocking_consume = blocking_consume
+        self.max_in_flight = max_in_flight
+        self.__in_flight = BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
         self.rescue = rescue
         self.max_rescue = max_rescue
+        self.rescue_scheduler = RescueScheduler(delay=rescue_delay,
+                                                backoff=rescue_backoff,
+                                                max_delay=rescue_max_delay,
+                                                jitter=rescue_jitter,
+                                                budget=rescue_budget,
+                                                pool=self.threads)
 
         self.convert_output = convert_output
+        self.copy_on_write = copy_on_write
+        self.__metrics = ActorMetrics()
 
     def _clear_all(self):
         self.__run.clear()
@@ -157,7 +224,8 @@ class Actor(object):
         Add the passed queue and queue name to
         '''
         self.pool.inbound.add(queue_name, queue=queue)
-        self.threads.spawn(self.__consumer, self.consume, queue)
+        function = self.consume_batch if self.batch_size > 1 else self.consume
+        self.threads.spawn(self.__consumer, function, queue)
 
     def ensure_tuple(self, data):
         if not isinstance(data, tuple):
@@ -201,13 +269,14 @@ class Actor(object):
 
     def send_event(self, event, queues=None, check_output=True):
         """
-        Sends event to all registered outbox queues. If multiple queues are consuming the event,
-        a deepcopy of the event is sent instead of raw event.
+        Sends event to all registered outbox queues. Each queue receives a deepcopy of the event, unless
+        copy_on_write is enabled, in which case the event is forked instead (See Event.fork)
         """
 
         if not queues:
             queues = self.pool.outbound
 
+        self.__metrics.events_out.add()
         self._loop_send(event, queues, check_output)
 
     def send_error(self, event):
@@ -216,6 +285,15 @@ class Actor(object):
         """
         self._loop_send(event, queues=self.pool.error, check_output=False)
 
+    def metrics(self):
+        """
+        Returns a snapshot of the runtime metrics of this actor (See compysition.metrics.ActorMetrics), along with the
+        depth and wait times of its inbound queues
+        """
+        metrics = self.__metrics.snapshot()
+        metrics["inbound_queues"] = {name: queue.metrics() for name, queue in self.pool.inbound.iteritems()}
+        return metrics
+
     def _loop_send(self, event, queues, check_output=True):
         """
         :param event:
@@ -238,9 +316,16 @@ class Actor(object):
                 raise InvalidActorOutput("Event was of type '{_type}', expected '{output}'".format(_type=type(event), output=self.output))
 
         try:
-            for queue in queues.itervalues():
-                self._send(queue, deepcopy(event))
+            queues = queues.values()
         except AttributeError:
+            pass
+
+        if self.copy_on_write:
+            queues = list(queues)
+            events = [event] + event.fork(copies=len(queues) - 1)
+            for queue, queue_event in zip(queues, events):
+                self._send(queue, queue_event)
+        else:
             for queue in queues:
                 self._send(queue, deepcopy(event))
 
@@ -265,39 +350,80 @@ class Actor(object):
             pass
 
     def __process_consumer_event(self, function, queue, timeout=None, raise_on_empty=False):
+        slots = None if self.__blocking_consume else self.__in_flight
+        if slots is not None:
+            # Blocks until a consume slot is free, so events stay on the inbound queue rather than in parked greenlets
+            slots.acquire()
+
         try:
-            event = self.__get_queued_event(queue=queue, timeout=timeout)
+            if self.batch_size > 1:
+                event, do_consume = self.__get_queued_batch(queue=queue, timeout=timeout), self.__do_consume_batch
+            else:
+                event, do_consume = self.__get_queued_event(queue=queue, timeout=timeout), self.__do_consume
         except QueueEmpty as err:
+            if slots is not None:
+                slots.release()
             if raise_on_empty:
                 raise err
         else:
             if self.__blocking_consume:
-                self.__do_consume(function, event, queue)
+                do_consume(function, event, queue)
             else:
-                self.threads.spawn(self.__do_consume, function, event, queue, restart=False)
+                greenlet = self.threads.spawn(do_consume, function, event, queue, restart=False)
+                if slots is not None:
+                    greenlet.link(lambda greenlet: slots.release())
 
     def __get_queued_event(self, queue, timeout=None):
         if timeout:
             return queue.get(block=True, timeout=timeout)
         return queue.get()
 
+    def __get_queued_batch(self, queue, timeout=None):
+        """
+        Blocks for the first event of a batch, then collects up to batch_size events, waiting at most batch_timeout for more to arrive
+        """
+        events = [self.__get_queued_event(queue=queue, timeout=timeout)]
+        deadline = time() + self.batch_timeout
+        while len(events) < self.batch_size:
+            remaining = deadline - time()
+            try:
+                if remaining > 0:
+                    events.append(queue.get(block=True, timeout=remaining))
+                else:
+                    events.append(queue.get())
+            except QueueEmpty:
+                break
+
+        return events
+
+    def __check_input(self, event):
+        if not isinstance(event, self.input):
+            new_event = event.convert(self.input[0])
+            self.logger.warning("Incoming event was of type '{_type}' when type {input} was expected. Converted to {converted}".format(
+                _type=type(event), input=self.input, converted=type(new_event)), event=event)
+            event = new_event
+
+        if self.REQUIRED_EVENT_ATTRIBUTES:
+            missing = [attribute for attribute in self.REQUIRED_EVENT_ATTRIBUTES if not event.get(attribute, None)]
+            if len(missing) > 0:
+                raise InvalidActorInput("Required incoming event attributes were missing: {missing}".format(missing=missing))
+
+        return event
+
     def __do_consume(self, function, event, queue):
         """
         A function designed to be spun up in a greenlet to maximize concurrency for the __consumer method
         This function actually calls the consume function for the actor
         """
-        try:
+        started = time()
+        self.__consume_event(function, event, queue)
+        self.__metrics.consumed(1, started)
 
-            if not isinstance(event, self.input):
-                new_event = event.convert(self.input[0])
-                self.logger.warning("Incoming event was of type '{_type}' when type {input} was expected. Converted to {converted}".format(
-                    _type=type(event), input=self.input, converted=type(new_event)), event=event)
-                event = new_event
-
-            if self.REQUIRED_EVENT_ATTRIBUTES:
-                missing = [attribute for attribute in self.REQUIRED_EVENT_ATTRIBUTES if not event.get(attribute, None)]
-                if len(missing) > 0:
-                    raise InvalidActorInput("Required incoming event attributes were missing: {missing}".format(missing=missing))
+    def __consume_event(self, function, event, queue, checked=False):
+        """Applies 'function' to a single event, checking the event first unless it already was (See __check_input)"""
+        try:
+            if not checked:
+                event = self.__check_input(event)
 
             try:
                 function(event, origin=queue.name, origin_queue=queue)
@@ -305,20 +431,67 @@ class Actor(object):
                 err.queue.wait_until_free() # potential TypeError if target queue is not sent
                 queue.put(event) # puts event back into origin queue
         except InvalidActorInput as error:
+            self.__metrics.errors += 1
             self.logger.error("Invalid input detected: {0}".format(error))
         except InvalidEventConversion:
+            self.__metrics.errors += 1
             self.logger.error("Event was of type '{_type}', expected '{input}'".format(_type=type(event), input=self.input))
         except Exception as err:
-            self.logger.warning("Event exception caught: {traceback}".format(traceback=traceback.format_exc()), event=event)
-            rescue_attribute = Actor._RESCUE_ATTRIBUTE_NAME_TEMPLATE.format(actor=self.name)
-            rescue_attempts =  event.get(rescue_attribute, 0)
-            if self.rescue and rescue_attempts < self.max_rescue:
-                setattr(event, rescue_attribute, rescue_attempts + 1)
-                sleep(1)
-                queue.put(event)
-            else:
-                event.error = err
-                self.send_error(event)
+            self.__process_consume_error(event, queue, err)
+
+    def __do_consume_batch(self, function, events, queue):
+        """
+        The batch equivalent of __do_consume. Events failing the input checks are dropped from the batch individually,
+        while an exception raised by 'function' applies to every event of the batch
+        """
+        started = time()
+        batch = []
+        for event in events:
+            try:
+                batch.append(self.__check_input(event))
+            except InvalidActorInput as error:
+                self.__metrics.errors += 1
+                self.logger.error("Invalid input detected: {0}".format(error))
+            except InvalidEventConversion:
+                self.__metrics.errors += 1
+                self.logger.error("Event was of type '{_type}', expected '{input}'".format(_type=type(event), input=self.input))
+            except Exception as err:
+                self.__process_consume_error(event, queue, err)
+
+        if batch:
+            try:
+                function(batch, origin=queue.name, origin_queue=queue)
+            except QueueFull as err:
+                err.queue.wait_until_free()
+                for event in batch:
+                    queue.put(event)
+            except Exception as err:
+                for event in batch:
+                    self.__process_consume_error(event, queue, err)
+
+        self.__metrics.consumed(len(events), started)
+
+    def __process_consume_error(self, event, queue, err):
+        self.__metrics.errors += 1
+        self.logger.warning("Event exception caught: {traceback}".format(traceback=traceback.format_exc()), event=event)
+        rescue_attribute = Actor._RESCUE_ATTRIBUTE_NAME_TEMPLATE.format(actor=self.name)
+        rescue_attempts =  event.get(rescue_attribute, 0)
+        if self.rescue and rescue_attempts < self.max_rescue:
+            setattr(event, rescue_attribute, rescue_attempts + 1)
+            if self.rescue_scheduler.schedule(event, queue, attempt=rescue_attempts + 1):
+                self.__metrics.rescues += 1
+                return
+            self.logger.warning("Rescue budget exhausted, event will not be retried", event=event)
+
+        event.error = err
+        self.send_error(event)
+
+    def consume_error(self, event, err, queue):
+        """
+        Handles an exception raised for a single event of a batch (See consume_batch) as if 'consume' had raised it for
+        that event, rescuing the event if rescue is enabled or sending it to the error queues otherwise
+        """
+        self.__process_consume_error(event, queue, err)
 
     def create_event(self, *args, **kwargs):
         try:
@@ -331,6 +504,18 @@ class Actor(object):
         else:
             raise ValueError("Unable to call create_event function with multiple output types defined")
             
+    def consume_batch(self, events, origin=None, origin_queue=None, *args, **kwargs):
+        """
+        Called instead of 'consume' with a list of up to batch_size events from the same inbound queue when batch_size > 1.
+        The events have already been converted to the actor's input and checked for REQUIRED_EVENT_ATTRIBUTES.
+        The default implementation consumes each event individually. Override this to amortize work across a batch
+
+        Args:
+            events:  A list of the implementation of event.Event this actor is consuming
+        """
+        for event in events:
+            self.__consume_event(self.consume, event, origin_queue, checked=True)
+
     @abc.abstractmethod
     def consume(self, event, *args, **kwargs):
         """
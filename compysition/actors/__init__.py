@@ -32,13 +32,15 @@ from .basicauth import BasicAuth
 from .xslt import XSLT
 from .eventdataaggregator import EventDataXMLAggregator, EventDataAggregator
 from .eventjoin import EventJoin, XMLEventJoin, JSONEventJoin
+from .batch import BatchAggregator, XMLBatchAggregator, BatchSplitter, XMLBatchSplitter
 from .flowcontroller import FlowController
 from .mdpactors import MDPClient
 from .mdpactors import MDPWorker
 from .mdpbroker import MDPBroker
 from .mdpregistrar import MDPBrokerRegistrationService
 from .eventlogger import EventLogger
-from .eventrouter import EventRouter, EventXMLFilter, EventFilter, HTTPMethodEventRouter, EventJSONFilter, EventXMLXpathsFilter, SimpleRouter
+from .eventrouter import (EventRouter, EventXMLFilter, EventFilter, HTTPMethodEventRouter, EventJSONFilter, EventXMLXpathsFilter, SimpleRouter,
+                          EventExactFilter, EventPrefixFilter)
 from .eventattributemodifier import (EventAttributeModifier, HTTPStatusModifier, XpathEventAttributeModifier, EventAttributeLookupModifier,
                                      HTTPXpathEventAttributeModifier, JSONEventAttributeModifier, HTTPJSONAttributeModifier, ErrorEventAttributeModifier,
                                      XMLErrorEventAttributeModifier, XMLEventAttributeModifier, XMLEventAttributeLookupModifier,
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#
+# -*- coding: utf-8 -*-
+#
+#  batch.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from copy import deepcopy
+from time import time
+from gevent.event import Event as GEvent
+from lxml import etree
+
+from compysition.actor import Actor
+from compysition.event import XMLEvent, JSONEvent
+from compysition.errors import MalformedEventData
+
+__all__ = [
+    "BatchAggregator",
+    "XMLBatchAggregator",
+    "BatchSplitter",
+    "XMLBatchSplitter"
+]
+
+
+class BatchAggregator(Actor):
+    '''**Collects the data of incoming events into batches, and sends each batch on as a single event with a list of records
+    as its data**
+
+    A batch is sent once it holds max_events events or max_bytes of event data, or once max_wait seconds have passed since
+    its first event arrived, whichever comes first
+
+    Parameters:
+
+        name (str):
+            | The instance name.
+        max_events (Optional[int]):
+            | The max amount of events in a batch. A value of 0 represents no limit
+            | Default: 100
+        max_bytes (Optional[int]):
+            | The max size (in bytes) of the event data in a batch, as serialized by Event.data_string. The batch is sent
+            | once the event that reaches this size is added. A value of 0 represents no limit
+            | Default: 0
+        max_wait (Optional[float]):
+            | The max time (in seconds) the first event of a batch waits for the batch to fill up. A value of 0 represents no limit
+            | Default: 1
+
+    '''
+
+    input = JSONEvent
+    output = JSONEvent
+
+    def __init__(self, name, max_events=100, max_bytes=0, max_wait=1, *args, **kwargs):
+        super(BatchAggregator, self).__init__(name, *args, **kwargs)
+        if not (max_events or max_bytes or max_wait):
+            raise ValueError("At least one of max_events, max_bytes or max_wait must be set")
+
+        self.key = kwargs.get('key', self.name)
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+        self.__records = []
+        self.__size = 0
+        self.__deadline = None
+        self.__wakeup = GEvent()
+
+    def pre_hook(self):
+        if self.max_wait > 0:
+            self.threads.spawn(self.batch_timer)
+
+    def post_hook(self):
+        self.flush()
+
+    def batch_timer(self):
+        while self.loop():
+            self.__wakeup.clear()
+            if self.__deadline is None:
+                self.__wakeup.wait()
+            elif self.__deadline > time():
+                self.__wakeup.wait(timeout=self.__deadline - time())
+            else:
+                self.flush()
+
+    def consume(self, event, *args, **kwargs):
+        if not self.__records and self.max_wait > 0:
+            self.__deadline = time() + self.max_wait
+            self.__wakeup.set()
+
+        self.__records.append(event.data)
+        if self.max_bytes:
+            self.__size += len(event.data_string())
+
+        if (self.max_events and len(self.__records) >= self.max_events) or (self.max_bytes and self.__size >= self.max_bytes):
+            self.flush()
+
+    def flush(self):
+        """Sends the current batch on as a single event, if it holds any records"""
+        records = self.__records
+        self.__records, self.__size, self.__deadline = [], 0, None
+        if records:
+            self.send_event(self.create_event(data=self.join_records(records)))
+
+    def join_records(self, records):
+        return records
+
+
+class XMLBatchAggregator(BatchAggregator):
+    '''**Collects the data of incoming events into batches, and sends each batch on as a single event with the records under
+    a single root XML element**
+
+    See BatchAggregator. The root element is named after the 'key' kwarg, or the instance name
+    '''
+
+    input = XMLEvent
+    output = XMLEvent
+
+    def join_records(self, records):
+        root = etree.Element(self.key)
+        for record in records:
+            root.append(record)
+        return root
+
+
+class BatchSplitter(Actor):
+    '''**Sends each record of an incoming batch (See BatchAggregator) on as an event of its own**
+
+    Every resulting event carries the meta_id of the batch event
+    '''
+
+    input = JSONEvent
+    output = JSONEvent
+
+    def consume(self, event, *args, **kwargs):
+        for record in self.split_records(event.data):
+            self.send_event(self.create_event(data=record, meta_id=event.meta_id))
+
+    def split_records(self, data):
+        if not isinstance(data, list):
+            raise MalformedEventData("Batch data must be a list of records, not {0}".format(type(data).__name__))
+        return data
+
+
+class XMLBatchSplitter(BatchSplitter):
+    '''**Sends each child element of an incoming batch (See XMLBatchAggregator) on as an event of its own**'''
+
+    input = XMLEvent
+    output = XMLEvent
+
+    def split_records(self, data):
+        records = []
+        for child in data:
+            # Comments and processing instructions in between the records are left out
+            if isinstance(child.tag, basestring):
+                # Each record becomes a document of its own, rather than a view into the batch's document
+                record = deepcopy(child)
+                record.tail = None
+                records.append(record)
+        return records
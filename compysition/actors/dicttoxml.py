@@ -1,15 +1,13 @@
 from __future__ import absolute_import
 
 from compysition.actor import Actor
-from compysition.event import XMLEvent, JSONEvent, Event
+from compysition.event import XMLEvent, JSONEvent, Event, EscapedText
 
 class DictToXML(Actor):
 
     input = JSONEvent
     output = XMLEvent
 
-    #TODO: Reimplement escape_xml flag functionality
-
     """
     **Actor implementation of the xmltodict lib (unparse). Converts an incoming dictionary to XML**
 
@@ -17,10 +15,12 @@ class DictToXML(Actor):
         name (str)
             | Actor Name
 
-        escape_xml (Optional[bool]) (Default: False)
+        escape_xml (Optional[bool|list]) (Default: False)
             | If set to True, a dict key or nested dict key that contains an XML-style string element will be
             | XML escaped. If False, that XML will be retained in the XML element node created from the dictionary key
-            | as a literal XML tree
+            | as a literal XML tree. If set to a list of keys, only the values of those keys (and of any keys nested
+            | in them) are escaped. Escaped values are not checked for XML at all, which saves a parse for every
+            | field that holds markup as text, such as escaped HTML
 
         mode (str<"data"|"properties"> (Default: "data")
             | If set to "data" it will convert the event data from dict to XML.
@@ -58,6 +58,7 @@ class DictToXML(Actor):
     def __init__(self, name, escape_xml=False, key=None, *args, **kwargs):
         super(DictToXML, self).__init__(name, *args, **kwargs)
         self.key = key or name
+        self.escape_xml = escape_xml if escape_xml is True or not escape_xml else frozenset(escape_xml)
 
     def consume(self, event, *args, **kwargs):
         try:
@@ -69,12 +70,29 @@ class DictToXML(Actor):
             raise
 
     def convert(self, event):
-        if len(event.data) > 1:
-            event.data = {self.key: event.data}
+        # The data is only read here, so that the XML it was converted from is kept as long as it is not modified (See Event.convert)
+        data = event._peek_data()
+        if len(data) > 1:
+            event.data = {self.key: data}
+
+        if self.escape_xml and not isinstance(event, XMLEvent):
+            event._data = _escape_text(event.data, self.escape_xml)
+            event.data_modified()
 
         return event.convert(XMLEvent)
 
 
+def _escape_text(value, keys, escape=False):
+    if isinstance(value, dict):
+        return value.__class__((key, _escape_text(item, keys, escape or keys is True or key in keys))
+                               for key, item in value.iteritems())
+    elif isinstance(value, list):
+        return [_escape_text(item, keys, escape) for item in value]
+    elif escape and isinstance(value, basestring):
+        return EscapedText(value if isinstance(value, unicode) else value.decode("utf-8"))
+    return value
+
+
 class PropertiesToXML(DictToXML):
     """
     **Subclass of DictToXml. Converts other event properties to XML, rather than incoming data**
@@ -89,6 +107,7 @@ class PropertiesToXML(DictToXML):
         properties_dict = {self.key: event.get_properties()}
         if isinstance(event, JSONEvent):
             event._data = properties_dict
+            event.data_modified()
         else:
             event.data = properties_dict
         if not isinstance(event, XMLEvent):
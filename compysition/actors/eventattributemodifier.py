@@ -30,9 +30,89 @@ from lxml import etree
 
 from .util.xpath import XPathLookup
 from compysition.actor import Actor
-from compysition.event import XMLEvent, JSONEvent
+from compysition.event import XMLEvent, JSONEvent, get_path_accessor
 from compysition.errors import MalformedEventData, CompysitionException
 
+_PLAIN_TAG_REGEX = re.compile(r"^[A-Za-z_][\w.-]*$")
+
+
+class KeyChainSetter(object):
+    """
+    The compiled form of a modifier key chain (See EventAttributeModifier), that sets a value at the end of the chain.
+    The first key is an event attribute and the others are dict keys, the dicts that are missing on the way are created.
+    A single key, or a flat path such as "data/foo", is set without walking the chain
+    """
+
+    __slots__ = ("key_chain", "event_key", "keys", "set")
+
+    def __init__(self, key_chain):
+        self.key_chain = key_chain
+        self.event_key, self.keys = key_chain[0], key_chain[1:]
+        if not self.keys:
+            self.set = self._set_attribute
+        elif len(self.keys) == 1:
+            self.set = self._set_flat
+        else:
+            self.set = self._set_nested
+
+    def __call__(self, event, value):
+        self.set(event, value)
+        return event
+
+    def _set_attribute(self, event, value):
+        event.set(self.event_key, value)
+
+    def _get_root(self, event):
+        root = event.get(self.event_key, None)
+        if not root:
+            root = {}
+            if event.set(self.event_key, root):
+                # The event may store a copy of the assigned dict (such as the data of a JSONEvent)
+                root = event.get(self.event_key, root)
+        return root
+
+    def _set_flat(self, event, value):
+        self._get_root(event)[self.keys[0]] = value
+
+    def _set_nested(self, event, value):
+        current_step = self._get_root(event)
+        for item in self.keys[:-1]:
+            try:
+                current_step = current_step[item]
+            except KeyError:
+                next_step = current_step[item] = {}
+                current_step = next_step
+        current_step[self.keys[-1]] = value
+
+
+class XMLKeyChainSetter(KeyChainSetter):
+    """
+    The compiled form of an XML modifier key chain: an event attribute, the tag of the root element it holds, and the path
+    of elements below the root, that are created when missing. Each step follows the first matching child, and steps that
+    are plain tag names find it among the children directly, rather than through an ElementPath search
+    """
+
+    __slots__ = ("steps", )
+
+    def __init__(self, key_chain):
+        super(XMLKeyChainSetter, self).__init__(key_chain)
+        self.steps = tuple((step, bool(_PLAIN_TAG_REGEX.match(step))) for step in self.keys[1:])
+        if self.keys:
+            self.set = self._set_element
+
+    def _set_element(self, event, value):
+        current_element = event.get(self.event_key, None)
+        if not self.keys[0] == current_element.tag:
+            raise ValueError("Expected a root element of '{0}', found '{1}'".format(self.keys[0], current_element.tag))
+
+        for step, plain in self.steps:
+            next_step = next(current_element.iterchildren(step), None) if plain else current_element.find(step)
+            if not etree.iselement(next_step):
+                next_step = etree.Element(step)
+                current_element.append(next_step)
+            current_element = next_step
+        current_element.text = str(value)
+
 class _FormatErrorInsertMixin:
     def get_modify_value(self, event):
         value = event.format_error()
@@ -53,6 +133,8 @@ class EventAttributeModifier(Actor):
         - separator (str)       (Default: "/") Delimiter for recursive key lookups
     '''
 
+    key_chain_setter = KeyChainSetter
+
     def __init__(self, name, key='data', value={}, log_change=False, separator="/", *args, **kwargs):
         super(EventAttributeModifier, self).__init__(name, *args, **kwargs)
         self.value = value
@@ -63,6 +145,9 @@ class EventAttributeModifier(Actor):
             self.key = key
 
         self.log_change = log_change
+        # The key chain is compiled once here rather than walked from the key on every event
+        self.key_chain = tuple(self.key.split(self.separator))
+        self.key_setter = self.key_chain_setter(self.key_chain)
 
     def consume(self, event, *args, **kwargs):
         modify_value = self.get_modify_value(event)
@@ -78,36 +163,11 @@ class EventAttributeModifier(Actor):
 
     def get_key_chain_value(self, event, value):
         #TODO: Redo this to not modify arrays
-        keys = self.key.split(self.separator)
-        event_key = keys.pop(0)
-        if len(keys) == 0:
-            event.set(event_key, value)
-        else:
-            current_step = event.get(event_key, None)
-            if not current_step:
-                current_step = {}
-                event.set(event_key, current_step)
-
-            try:
-                while True:
-                    try:
-                        item = keys.pop(0)
-                        if len(keys) > 0:
-                            next_step = current_step[item]
-                            current_step = next_step
-                        else:
-                            current_step[item] = value
-                    except KeyError:
-                        next_step = {} if len(keys) > 0 else value
-                        current_step[item] = next_step
-                        current_step = next_step
-                    except IndexError:
-                        break
-            except Exception as err:
-                self.logger.error("Unable to follow key chain. Ran into non-dict value of '{value}'".format(value=current_step), event=event)
-                raise
-
-        return event
+        try:
+            return self.key_setter(event, value)
+        except Exception as err:
+            self.logger.error("Unable to follow key chain '{key}': {err}".format(key=self.key, err=err), event=event)
+            raise
 
     def get_modify_value(self, event):
         return self.value
@@ -115,8 +175,13 @@ class EventAttributeModifier(Actor):
 
 class EventAttributeLookupModifier(EventAttributeModifier):
 
+    def __init__(self, *args, **kwargs):
+        super(EventAttributeLookupModifier, self).__init__(*args, **kwargs)
+        self.value_accessor = get_path_accessor(self.value)
+
     def get_modify_value(self, event):
-        return event.lookup(self.value)
+        # Equivalent to event.lookup(self.value)
+        return self.value_accessor(event)
 
 
 class EventAttributeDelete(Actor):
@@ -240,58 +305,38 @@ class JSONEventAttributeModifier(EventAttributeModifier):
     def __init__(self, name, separator="/", *args, **kwargs):
         self.separator = separator
         super(JSONEventAttributeModifier, self).__init__(name, *args, **kwargs)
+        self.value_chain = tuple(self.value.split(self.separator)) if isinstance(self.value, basestring) else None
 
     def get_modify_value(self, event):
+        value_chain = self.value_chain if self.value_chain is not None else self.value.split(self.separator)
         data = event.data
         if isinstance(data, list):
             for datum in data:
-                value = reduce(lambda acc, key: acc.get(key, {}), [datum] + self.value.split(self.separator))
+                value = self._get_chain_value(datum, value_chain)
                 if value is not None:
                     break
         else:
-            value = reduce(lambda acc, key: acc.get(key, {}), [data] + self.value.split(self.separator))
+            value = self._get_chain_value(data, value_chain)
 
         if isinstance(value, dict) and len(value) == 0:
             value = None
 
         return value
 
+    @staticmethod
+    def _get_chain_value(value, value_chain):
+        for key in value_chain:
+            value = value.get(key, {})
+        return value
+
 class HTTPJSONAttributeModifier(JSONEventAttributeModifier, HTTPStatusModifier):
     pass
 
 
 class XMLEventAttributeModifier(EventAttributeModifier):
     input = XMLEvent
-    
-    def get_key_chain_value(self, event, value):
-        keys = self.key.split(self.separator)
-        event_key = keys.pop(0)
-        if len(keys) == 0:
-            event.set(event_key, value)
-        else:
-            root_element = event.get(event_key, None)
-            current_element = root_element
 
-            try:
-                item = keys.pop(0)
-                if not item == current_element.tag:
-                    raise
-                while True:
-                    if len(keys) > 0:
-                        item = keys.pop(0)
-                        next_step = current_element.find(item)
-                        if not etree.iselement(next_step):
-                            next_step = etree.Element(item)
-                            current_element.append(next_step)
-                        current_element = next_step
-                    else:
-                        current_element.text = str(value)
-                        break
-            except Exception as err:
-                self.logger.error("Unable to follow key chain. Ran into non-xml value of '{value}'".format(value=current_element), event=event)
-                raise
-
-        return event
+    key_chain_setter = XMLKeyChainSetter
 
 class XMLEventAttributeLookupModifier(XMLEventAttributeModifier, EventAttributeLookupModifier):
     pass
@@ -434,10 +479,11 @@ class EventAttributeRegexSubstitution(Actor):
 
         self.pattern = pattern
         self.event_attr = event_attr
+        self.event_attr_accessor = get_path_accessor(event_attr)
         self.replace_with = replace_with
 
     def consume(self, event, *args, **kwargs):
-        value = event.lookup(self.event_attr)
+        value = self.event_attr_accessor(event)
         value = re.sub(self.pattern, self.replace_with, value)
         event.set(self.event_attr, value)
         self.send_event(event)
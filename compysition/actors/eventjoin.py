@@ -22,14 +22,20 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+import heapq
 import traceback
-import gevent
 
+from itertools import count
 from time import time
+from gevent.event import Event as GEvent
 from lxml import etree
 
 from compysition.actor import Actor
-from compysition.event import XMLEvent, JSONEvent
+from compysition.event import XMLEvent, JSONEvent, get_path_accessor
+from compysition.errors import ActorTimeout, EventRateExceeded, EventAttributeError
+
+# Marks an inbox that has not reported yet, as any data (including False) may be reported
+NOT_REPORTED = object()
 
 class MatchedEvent(object):
 
@@ -37,27 +43,38 @@ class MatchedEvent(object):
         self.inboxes_reported = {}
         self.key = key or "joined_root"
         self.created = time()
+        self.event = None
         if not isinstance(inboxes, list):
             inboxes = [inboxes]
 
-        self.inboxes_reported = {inbox: False for inbox in inboxes}
+        self.inboxes_reported = {inbox: NOT_REPORTED for inbox in inboxes}
+        self.pending = len(self.inboxes_reported)
 
-    def report_inbox(self, inbox_name, data):
-        if self.inboxes_reported[inbox_name] == False:
+    def report_inbox(self, inbox_name, data, event=None):
+        if self.inboxes_reported[inbox_name] is NOT_REPORTED:
             self.inboxes_reported[inbox_name] = data
+            self.pending -= 1
+            if event is not None:
+                self.event = event
         else:
             raise Exception("Inbox {0} already reported for event. Ignoring".format(inbox_name))
 
     def all_inboxes_reported(self):
-        for key, value in self.inboxes_reported.iteritems():
-            if value == False:
-                return False
+        return self.pending == 0
+
+    @property
+    def reported(self):
+        """The data of the inboxes that have reported so far"""
+        return [data for data in self.inboxes_reported.itervalues() if data is not NOT_REPORTED]
 
-        return True
+    @property
+    def missing(self):
+        """The names of the inboxes that have not reported yet"""
+        return sorted(getattr(inbox, "name", inbox) for inbox, data in self.inboxes_reported.iteritems() if data is NOT_REPORTED)
 
     @property
     def joined(self):
-        return [data for data in self.inboxes_reported.itervalues()]
+        return self.reported
 
 
 class MatchedXMLEvent(MatchedEvent):
@@ -65,7 +82,7 @@ class MatchedXMLEvent(MatchedEvent):
     @property
     def joined(self):
         root = etree.Element(self.key)
-        map(lambda xml: root.append(xml), self.inboxes_reported.itervalues())
+        map(lambda xml: root.append(xml), self.reported)
         return root
 
 
@@ -73,61 +90,176 @@ class MatchedJSONEvent(MatchedEvent):
 
     @property
     def joined(self):
-        return {k: v for d in self.inboxes_reported.itervalues() for k, v in d.iteritems()}
+        return {k: v for d in self.reported for k, v in d.iteritems()}
 
 
 class EventJoin(Actor):
-    '''**Holds event data until all inbound queues have reported in with events with a matching event_id, then aggregates the data
-    and sends it on**
+    '''**Holds event data until all inbound queues have reported in with events with a matching event_id (or correlation_key),
+    then aggregates the data and sends it on**
 
     Parameters:
 
         name (str):
             | The instance name.
         purge_interval (Optional[int]):
-            | If set, determines the interval that events are purged, rather than staying in memory
+            | If set, determines the time (in seconds) after which a pending join is expired, rather than staying in memory
             | waiting for the other messages. Useful in the event that a certain split event has errored out on
             | one of it's paths to rejoin the main flow. A value of 0 indicates that no purges occur
             | Default: 0
-
+        max_pending (Optional[int]):
+            | The max amount of joins that may be pending at once. Once it is reached, the pending join closest to
+            | expiring (the oldest) is expired to make room for a new one. A value of 0 represents no limit
+            | Default: 0
+        expire_policy (Optional[str]):
+            | What happens to a pending join once it expires. "drop" discards it, "partial" sends on the data of the
+            | inboxes that did report, and "error" sends the last received event to the error queues. Either event lists the
+            | names of the inboxes that did not report under the '<name>_missing_inboxes' attribute
+            | Default: drop
+        correlation_key (Optional[str or tuple]):
+            | The Event.lookup path of the value that events are joined on, e.g. "meta_id" or ("data", "order", "id").
+            | An event without a value there is sent to the error queues. If not set, events are joined on their event_id
+            | Default: None
+        timeout_key (Optional[str or tuple]):
+            | The Event.lookup path of a deadline (in seconds) for the join started by an event. It takes precedence over
+            | purge_interval, so that each join may be bounded to the latency its requester can afford
+            | Default: None
+
+    Pending joins are expired through a timer heap that a single greenlet drains as they come due, rather than by
+    periodically scanning every pending join
     '''
 
     matched_event_class = MatchedEvent
+    EXPIRE_POLICIES = ("drop", "partial", "error")
+    _MISSING_ATTRIBUTE_NAME_TEMPLATE = "{actor}_missing_inboxes"
 
-    def __init__(self, name, purge_interval=None, *args, **kwargs):
+    def __init__(self, name, purge_interval=None, max_pending=0, expire_policy="drop", correlation_key=None, timeout_key=None,
+                 *args, **kwargs):
         super(EventJoin, self).__init__(name, *args, **kwargs)
+        if expire_policy not in self.EXPIRE_POLICIES:
+            raise ValueError("expire_policy must be one of {0}, not '{1}'".format(self.EXPIRE_POLICIES, expire_policy))
+
         self.events = {}
         self.key = kwargs.get('key', self.name)
         self.purge_interval = purge_interval
+        self.max_pending = max_pending
+        self.expire_policy = expire_policy
+        self.correlation_accessor = get_path_accessor(correlation_key) if correlation_key else None
+        self.timeout_accessor = get_path_accessor(timeout_key) if timeout_key else None
+        self.__expiries = []
+        self.__sequence = count()
+        self.__wakeup = GEvent()
 
     def pre_hook(self):
-        if self.purge_interval and self.purge_interval > 0:
+        if (self.purge_interval and self.purge_interval > 0) or self.timeout_accessor:
             self.threads.spawn(self.event_purger)
 
     def event_purger(self):
+        expiries = self.__expiries
         while self.loop():
-            event_keys = self.events.keys()
-            for key in event_keys:
-                event = self.events.get(key, None)
-                if event:
-                    purge_time = event.created + self.purge_interval
-                    if purge_time < time():
-                        del self.events[key]
-            gevent.sleep(self.purge_interval / 2)
+            self.__wakeup.clear()
+            timeout = expiries[0][0] - time() if expiries else None
+            if timeout is None or timeout > 0:
+                self.__wakeup.wait(timeout=timeout if timeout != float("inf") else None)
+
+            now = time()
+            while expiries and expiries[0][0] <= now:
+                expires, sequence, key, waiting_event = heapq.heappop(expiries)
+                if self.events.get(key) is waiting_event:
+                    del self.events[key]
+                    self.expire(waiting_event, ActorTimeout("Join was not completed within {0} seconds".format(
+                        round(expires - waiting_event.created, 3))))
+
+    def get_timeout(self, event):
+        """Returns the time (in seconds) that the join started by event may stay pending, or None if it never expires"""
+        if self.timeout_accessor:
+            timeout = self.timeout_accessor(event)
+            if timeout is not None:
+                try:
+                    return float(timeout)
+                except (TypeError, ValueError):
+                    self.logger.warning("Invalid join timeout '{0}'. Using the default".format(timeout), event=event)
+
+        return self.purge_interval if self.purge_interval and self.purge_interval > 0 else None
+
+    def add_pending(self, key, waiting_event, timeout=None):
+        """
+        Holds waiting_event as the pending join of key until timeout (in seconds) has passed, expiring the oldest
+        pending join if max_pending is reached
+        """
+        if timeout is None and not self.max_pending:
+            self.events[key] = waiting_event
+            return
+
+        expiries = self.__expiries
+        if self.max_pending and len(self.events) >= self.max_pending:
+            self.__expire_oldest()
+
+        # Pending joins that never come due are still ordered by age for max_pending
+        expires = waiting_event.created + timeout if timeout is not None else float("inf")
+        self.events[key] = waiting_event
+        heapq.heappush(expiries, (expires, next(self.__sequence), key, waiting_event))
+        if expiries[0][3] is waiting_event:
+            self.__wakeup.set()
+
+        # Completed joins leave their entry behind, so the heap is compacted once they make up most of it
+        if len(expiries) > 2 * len(self.events) + 64:
+            expiries[:] = [entry for entry in expiries if self.events.get(entry[2]) is entry[3]]
+            heapq.heapify(expiries)
+
+    def __expire_oldest(self):
+        expiries = self.__expiries
+        while expiries:
+            expires, sequence, key, waiting_event = heapq.heappop(expiries)
+            if self.events.get(key) is waiting_event:
+                del self.events[key]
+                self.expire(waiting_event, EventRateExceeded("Join was evicted as {0} joins were pending".format(self.max_pending)))
+                return
+
+    def expire(self, waiting_event, error):
+        """Handles a pending join that was removed before all inboxes reported, according to the expire_policy"""
+        event = waiting_event.event
+        if event is not None:
+            event.set(self._MISSING_ATTRIBUTE_NAME_TEMPLATE.format(actor=self.name), waiting_event.missing)
+
+        if self.expire_policy == "partial" and event is not None:
+            self.logger.warning("{0}. Sending partial join".format(error), event=event)
+            event.data = waiting_event.joined
+            self.send_event(event)
+        elif self.expire_policy == "error" and event is not None:
+            self.logger.warning("{0}. Sending to error queues".format(error), event=event)
+            event.error = error
+            self.send_error(event)
+        else:
+            self.logger.warning("{0}. Discarding pending join".format(error), event=event)
+
+    def get_correlation_key(self, event):
+        if self.correlation_accessor is None:
+            return event.event_id
+
+        key = self.correlation_accessor(event)
+        if key is None:
+            raise EventAttributeError("Event has no value at join correlation key {0}".format(self.correlation_accessor.path))
+        return key
 
     def consume(self, event, *args, **kwargs):
         inbox_origin = kwargs.get('origin_queue', None)
-        waiting_event = self.events.get(event.event_id, None)
+        key = self.get_correlation_key(event)
+        waiting_event = self.events.get(key, None)
         try:
-            if waiting_event:
-                waiting_event.report_inbox(inbox_origin, event.data)
-                if waiting_event.all_inboxes_reported():
-                    event.data = waiting_event.joined
-                    self.send_event(event)
-                    del self.events[event.event_id]
+            if waiting_event is None:
+                waiting_event = self.matched_event_class(self.pool.inbound.values(), key=self.key)
+                waiting_event.report_inbox(inbox_origin, event.data, event=event)
+                if not waiting_event.all_inboxes_reported():
+                    self.add_pending(key, waiting_event, timeout=self.get_timeout(event))
+                    return
             else:
-                self.events[event.event_id] = self.matched_event_class(self.pool.inbound.values(), key=self.key)
-                self.events.get(event.event_id).report_inbox(inbox_origin, event.data)
+                waiting_event.report_inbox(inbox_origin, event.data, event=event)
+                if not waiting_event.all_inboxes_reported():
+                    return
+                del self.events[key]
+
+            event.data = waiting_event.joined
+            self.send_event(event)
         except Exception:
             self.logger.warn("Could not process incoming event: {0}".format(traceback.format_exc()), event=event)
 
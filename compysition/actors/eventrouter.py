@@ -21,14 +21,14 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-import json
 import re
 
 from lxml import etree
 
-from .util.xpath import XPathLookup
+from .util.xpath import XPathLookup, document_scope
 from compysition.actor import Actor
-from compysition.event import HttpEvent
+from compysition.cache import LRUCache
+from compysition.event import HttpEvent, get_json_codec, PathAccessor, get_path_accessor
 from compysition.errors import SetupError, EventCommandNotAllowed
 
 
@@ -61,6 +61,7 @@ class EventRouter(Actor):
         self.filters = []
         self.default_outbox_regexes = default_outbox_regexes if isinstance(default_outbox_regexes, list) else [default_outbox_regexes]
         self.default_outboxes = []
+        self.filter_engine = None
         if not isinstance(routing_filters, list):
             routing_filters = [routing_filters]
 
@@ -78,6 +79,7 @@ class EventRouter(Actor):
         self._initialize_outboxes()
 
     def _initialize_outboxes(self):
+        self.filter_engine = FilterEngine(self.filters)
         self._initialize_filter_outboxes()
         if not self.whitelist:
             self._initialize_default_outboxes()
@@ -114,17 +116,27 @@ class EventRouter(Actor):
                             exception=err))
 
     def consume(self, event, *args, **kwargs):
+        if self.filter_engine is None:
+            self.filter_engine = FilterEngine(self.filters)
+
         matched = False
-        for filter in self.filters:
-            if filter.matches(event):
-                matched = True
-                if len(filter.outboxes) > 0:
-                    self.send_event(event, queues=filter.outboxes)
-                    self.logger.debug("EventFilter matched for outbound queues ({outbox_names}). Event successfully forwarded".format(
-                            outbox_names=filter.outbox_names),
-                        event=event)
-                else:
-                    self.logger.info("EventFilter matched, but no outbound queues were defined for filter. Event has been discarded.", event=event)
+        forwarding = []
+        outboxes = []
+        for filter in self.filter_engine.matching_filters(event):
+            matched = True
+            if len(filter.outboxes) > 0:
+                forwarding.append(filter)
+                outboxes.extend(filter.outboxes)
+            else:
+                self.logger.info("EventFilter matched, but no outbound queues were defined for filter. Event has been discarded.", event=event)
+
+        if outboxes:
+            # Sent once for all matched filters so that every outbox receives its own copy of the event
+            self.send_event(event, queues=outboxes)
+            for filter in forwarding:
+                self.logger.debug("EventFilter matched for outbound queues ({outbox_names}). Event successfully forwarded".format(
+                        outbox_names=filter.outbox_names),
+                    event=event)
 
         if not matched:
             self.process_no_match(event)
@@ -145,33 +157,73 @@ class EventRouter(Actor):
     def set_filter(self, filter):
         if isinstance(filter, EventFilter):
             self.filters.append(filter)
+            self.filter_engine = None
         else:
             raise TypeError("The provided filter is not a valid EventFilter type")
 
 
+def _get_filter_class(match_mode):
+    try:
+        return {"regex": EventFilter, "exact": EventExactFilter, "prefix": EventPrefixFilter}[match_mode]
+    except KeyError:
+        raise ValueError("match_mode must be one of 'regex', 'exact' or 'prefix', not '{0}'".format(match_mode))
+
+
 class SimpleRouter(EventRouter):
 
-    def __init__(self, name, default_queue="default", scope="data", type="blacklist", *args, **kwargs):
+    """**An EventRouter that routes events to the outbox named after the value in 'scope'**
+
+    Parameters:
+
+        name (str):
+            | The instance name.
+        default_queue (Optional[str]):
+            | The outbox that does not receive a filter of its own
+            | (Default: default)
+        scope (Optional[str]):
+            | The event attribute that holds the value to route on
+            | (Default: data)
+        match_mode (Optional[str]):
+            | How the value is compared to the outbox names. "regex" searches the value with each outbox name as a regex,
+            | "exact" matches outboxes named exactly as the value with a single dict lookup, and "prefix" matches outboxes
+            | whose name starts the value, through a prefix trie
+            | (Default: regex)
+    """
+
+    def __init__(self, name, default_queue="default", scope="data", type="blacklist", match_mode="regex", *args, **kwargs):
         super(SimpleRouter, self).__init__(name, type=type, *args, **kwargs)
         self.default_queue = default_queue
         self.scope = scope
+        self.filter_class = _get_filter_class(match_mode)
 
     def pre_hook(self):
         for queue in self.pool.outbound:
             if queue != self.default_queue:
-                self.set_filter(EventFilter(value_regexes=queue, outbox_names=[queue], event_scope=(self.scope, )))
+                self.set_filter(self.filter_class(queue, outbox_names=[queue], event_scope=(self.scope, )))
 
         super(SimpleRouter, self).pre_hook()
 
 
 class HTTPMethodEventRouter(EventRouter):
 
+    """**An EventRouter that routes HttpEvents to the outbox named after their HTTP method**
+
+    Parameters:
+
+        name (str):
+            | The instance name.
+        match_mode (Optional[str]):
+            | How the method is compared to the outbox names (See SimpleRouter)
+            | (Default: regex)
+    """
+
     HTTP_METHODS = ["GET", "POST", "DELETE", "PATCH", "HEAD", "PUT", "OPTIONS"]
     input = HttpEvent
     output = HttpEvent
 
-    def __init__(self, name, *args, **kwargs):
+    def __init__(self, name, match_mode="regex", *args, **kwargs):
         super(HTTPMethodEventRouter, self).__init__(name, type="blacklist", *args, **kwargs)
+        self.filter_class = _get_filter_class(match_mode)
 
     def process_no_match(self, event, *args, **kwargs):
         event.headers['Allow'] = ", ".join(self.pool.outbound)
@@ -182,7 +234,7 @@ class HTTPMethodEventRouter(EventRouter):
     def pre_hook(self):
         for queue in self.pool.outbound:
             if queue in self.HTTP_METHODS:
-                self.set_filter(EventFilter(value_regexes=queue, outbox_names=[queue], event_scope=("method", )))
+                self.set_filter(self.filter_class(queue, outbox_names=[queue], event_scope=("method", )))
             else:
                 self.logger.warn("Queue {queue} is not a valid HTTP method and was not added as a routing option")
 
@@ -244,6 +296,7 @@ class EventFilter(object):
             self.event_scope = (event_scope,)
         else:
             raise TypeError("The defined event_scope must be either type str or tuple(str)")
+        self.scope_accessor = get_path_accessor(self.event_scope, ScopeAccessor)
 
     def set_next_filter(self, filter):
         if filter is not None:
@@ -255,12 +308,15 @@ class EventFilter(object):
             self.next_filter = None
 
     def matches(self, event):
+        return self._matches_regexes(event, self.value_regexes)
+
+    def _matches_regexes(self, event, value_regexes):
         values = self._get_value(event, self.event_scope)
         try:
             while True:
                 value = next(values)
                 if value is not None:
-                    for value_regex in self.value_regexes:
+                    for value_regex in value_regexes:
                         if value_regex.search(str(value)):
                             if self.next_filter:
                                 return self.next_filter.matches(event)
@@ -270,30 +326,293 @@ class EventFilter(object):
             pass
         except Exception as err:
             raise Exception(
-                "Error in attempting to apply regex patterns {0} to {1}: {2}".format(self.value_regexes, values, err))
+                "Error in attempting to apply regex patterns {0} to {1}: {2}".format(value_regexes, values, err))
 
         return False
 
     def _get_value(self, event, event_scope, *args, **kwargs):
         """
-        This method iterates through the self.event_scope tuple in a series of getattr or get calls,
+        This method follows the event_scope tuple through a series of getattr or get calls (See ScopeAccessor),
         depending on if the event in the scope step is a dict or an object. More supported types may be added in the future
         If the chain fails at any point, a None is returned
         """
+        if event_scope is self.event_scope:
+            yield self.scope_accessor(event)
+            return
+
         try:
-            current_step = event
-            for scope_step in event_scope:
-                if isinstance(current_step, dict):
-                    current_step = current_step.get(scope_step, None)
-                elif isinstance(current_step, (tuple, list)):
-                    current_step = current_step[scope_step]
-                elif isinstance(current_step, object):
-                    # This is confusing, as everything is an object, so this is always True. Leaving in for now.
-                    current_step = getattr(current_step, scope_step, None)
-        except Exception as err:
-            current_step = None
+            accessor = get_path_accessor(event_scope, ScopeAccessor)
+        except TypeError:
+            yield None
+        else:
+            yield accessor(event)
 
-        yield current_step
+
+class ScopeAccessor(PathAccessor):
+    """
+    The compiled form of an EventFilter event_scope. A step is a dict key for dicts, an (int) index for lists and tuples,
+    and an attribute for any other object
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def _get_index(key):
+        return key if isinstance(key, (int, long)) else None
+
+    def __call__(self, obj):
+        for key, index in self._steps:
+            if obj is None:
+                break
+            elif isinstance(obj, dict):
+                obj = obj.get(key, None)
+            elif isinstance(obj, (tuple, list)):
+                if index is None or not -len(obj) <= index < len(obj):
+                    return None
+                obj = obj[index]
+            else:
+                try:
+                    obj = getattr(obj, key, None)
+                except Exception:
+                    return None
+        return obj
+
+
+class EventExactFilter(EventFilter):
+    '''
+    **A filter class for the EventRouter module that matches when the value in event_scope equals one of the provided values,
+    rather than applying regexes. An EventRouter resolves any number of these filters with a single dict lookup**
+
+    Parameters:
+        values ([str] or str):
+            | The literal value(s) that will cause this filter to match
+        (See EventFilter for the remaining parameters)
+    '''
+
+    def __init__(self, values=[], *args, **kwargs):
+        super(EventExactFilter, self).__init__(value_regexes=[], *args, **kwargs)
+        self.values = values if isinstance(values, list) else [values]
+
+    def matches(self, event):
+        value = next(self._get_value(event, self.event_scope))
+        return value is not None and self._matches_value(str(value))
+
+    def _matches_value(self, value):
+        return value in self.values
+
+
+class EventPrefixFilter(EventExactFilter):
+    '''
+    **A filter class for the EventRouter module that matches when the value in event_scope starts with one of the provided
+    values. An EventRouter resolves any number of these filters through a single prefix trie**
+
+    Parameters:
+        values ([str] or str):
+            | The prefix(es) that will cause this filter to match
+        (See EventFilter for the remaining parameters)
+    '''
+
+    def _matches_value(self, value):
+        return any(value.startswith(prefix) for prefix in self.values)
+
+
+class FilterEngine(object):
+    """
+    Evaluates a list of EventFilters against an event, returning the matching filters in their original order.
+
+    Filters of the same kind that share an event_scope are grouped, so that the scope value is looked up and converted to
+    a string once per event rather than once per filter:
+        - EventExactFilters resolve the value to their filters with a single dict lookup
+        - EventPrefixFilters walk the value through a prefix trie of their values
+        - Plain EventFilters merge their regexes into a single pattern of optional lookaheads, one per filter, each of which
+          marks its filter with an empty named group when the filter would match. The results are also remembered for
+          recent (short) scope values, so that routing on a handful of repeated values does not run any regex at all
+    Other filters are evaluated one by one, within a document_scope so that XML filters discover the namespaces of the event
+    data only once
+    """
+
+    def __init__(self, filters):
+        self.filters = list(filters)
+        groups = {}
+        self.groups = []
+        self.individual = []
+        for index, filter in enumerate(self.filters):
+            for group_class in (_ExactFilterGroup, _PrefixFilterGroup, _RegexFilterGroup):
+                if group_class.accepts(filter):
+                    key = (group_class, filter.event_scope)
+                    group = groups.get(key)
+                    if group is None:
+                        group = groups[key] = group_class(filter.event_scope)
+                        self.groups.append(group)
+                    group.add(index, filter)
+                    break
+            else:
+                self.individual.append(index)
+
+        for group in self.groups:
+            group.compile()
+
+    def matching_filters(self, event):
+        matched = set()
+        for group in self.groups:
+            matched.update(group.match(event))
+        with document_scope():
+            for index in self.individual:
+                if self.filters[index].matches(event):
+                    matched.add(index)
+        return [self.filters[index] for index in sorted(matched)]
+
+
+def _is_plain(filter, filter_class, methods=("matches", "_get_value")):
+    """Whether filter matches events exactly as a filter_class would, and so may be evaluated as part of a group"""
+    return isinstance(filter, filter_class) and filter.next_filter is None and \
+        all(getattr(filter.__class__, method).im_func is getattr(filter_class, method).im_func for method in methods)
+
+
+class _FilterGroup(object):
+    """The filters of a single kind and event_scope (See FilterEngine)"""
+
+    def __init__(self, event_scope):
+        self.accessor = get_path_accessor(event_scope, ScopeAccessor)
+        self.filters = []
+
+    def add(self, index, filter):
+        self.filters.append((index, filter))
+
+    def compile(self):
+        pass
+
+    def get_scope_value(self, event):
+        """Returns the scope value of event as a string, or None if there is none"""
+        value = self.accessor(event)
+        if value is not None:
+            try:
+                value = str(value)
+            except Exception as err:
+                raise Exception("Error in attempting to apply regex patterns to {0}: {1}".format(self.accessor.path, err))
+        return value
+
+
+class _ExactFilterGroup(_FilterGroup):
+
+    @classmethod
+    def accepts(cls, filter):
+        return _is_plain(filter, EventExactFilter, methods=("matches", "_matches_value", "_get_value"))
+
+    def compile(self):
+        self.table = {}
+        for index, filter in self.filters:
+            for value in filter.values:
+                self.table.setdefault(value, []).append(index)
+
+    def match(self, event):
+        value = self.get_scope_value(event)
+        if value is None:
+            return ()
+        return self.table.get(value, ())
+
+
+class _PrefixFilterGroup(_FilterGroup):
+
+    # The key that holds the filters of the values that end at a node of the trie, as no character is None
+    END = None
+
+    @classmethod
+    def accepts(cls, filter):
+        return _is_plain(filter, EventPrefixFilter, methods=("matches", "_matches_value", "_get_value"))
+
+    def compile(self):
+        self.trie = {}
+        for index, filter in self.filters:
+            for value in filter.values:
+                node = self.trie
+                for character in value:
+                    node = node.setdefault(character, {})
+                node.setdefault(self.END, []).append(index)
+
+    def match(self, event):
+        value = self.get_scope_value(event)
+        if value is None:
+            return ()
+
+        node = self.trie
+        matched = list(node.get(self.END, ()))
+        for character in value:
+            node = node.get(character)
+            if node is None:
+                break
+            matched.extend(node.get(self.END, ()))
+        return matched
+
+
+class _RegexFilterGroup(_FilterGroup):
+
+    # Python limits a pattern to 100 groups, named or not
+    MAX_GROUPS = 90
+
+    # Scope values up to this length have their matches remembered
+    MAX_CACHED_LENGTH = 256
+
+    # Patterns that rely on their own group numbering or names (back or conditional references), or set flags for the
+    # whole pattern, are not merged
+    UNSAFE_PATTERN_REGEX = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(|\(\?[iLmsux]+\)")
+
+    def __init__(self, event_scope):
+        super(_RegexFilterGroup, self).__init__(event_scope)
+        self.patterns = []
+        self.results = LRUCache(maxsize=1024)
+
+    @classmethod
+    def accepts(cls, filter):
+        if not _is_plain(filter, EventFilter) or not filter.value_regexes:
+            return False
+
+        for regex in filter.value_regexes:
+            if regex.flags & ~re.UNICODE or cls.UNSAFE_PATTERN_REGEX.search(regex.pattern):
+                return False
+        return True
+
+    def compile(self):
+        parts, marks, groups = [], [], 0
+        for index, filter in self.filters:
+            filter_groups = 1 + sum(regex.groups for regex in filter.value_regexes)
+            if parts and groups + filter_groups > self.MAX_GROUPS:
+                self.patterns.append(self.__compile_pattern(parts, marks))
+                parts, marks, groups = [], [], 0
+
+            name = "filter{0}".format(index)
+            alternatives = "|".join(regex.pattern for regex in filter.value_regexes)
+            parts.append("(?:(?=[\\s\\S]*?(?:{alternatives}))(?P<{name}>))?".format(alternatives=alternatives, name=name))
+            marks.append(name)
+            groups += filter_groups
+
+        if parts:
+            self.patterns.append(self.__compile_pattern(parts, marks))
+
+    def __compile_pattern(self, parts, marks):
+        # Each filter is marked by the index of its filter in the engine and the number of its named group in the pattern
+        pattern = re.compile("".join(parts))
+        return pattern, [(int(name[6:]), pattern.groupindex[name]) for name in marks]
+
+    def match(self, event):
+        value = self.get_scope_value(event)
+        if value is None:
+            return ()
+
+        cacheable = len(value) <= self.MAX_CACHED_LENGTH
+        if cacheable:
+            matched = self.results.get(value)
+            if matched is not None:
+                return matched
+
+        matched = []
+        for pattern, marks in self.patterns:
+            spans = pattern.match(value).regs
+            matched.extend(index for index, group in marks if spans[group][0] != -1)
+
+        if cacheable:
+            self.results[value] = matched
+        return matched
 
 
 class EventXMLFilter(EventFilter):
@@ -353,29 +672,38 @@ class EventXMLXpathsFilter(EventXMLFilter):
     **A filter that uses the results from one xpath lookup to compare to the values from a second xpath lookup. A dynamic
     definition of 'value_regexes' based on the lookup of 'value_xpath'
 
+    The regexes looked up for an event are only used to match that event, so that events matched concurrently do not
+    share them. Compiled regexes are kept in a bounded cache shared by all instances (See compiled_regexes)
+
     Parameters:
         value_xpath (str):
             | An xpath that will look up the value(s) of the regexes to be compared to the 'xpath' lookup result
             | Follows standard xpath formatting
     """
 
+    # The compiled form of recently looked up regexes, by pattern
+    compiled_regexes = LRUCache(maxsize=1024)
+
     def __init__(self, regex_xpath=None, *args, **kwargs):
         super(EventXMLXpathsFilter, self).__init__(value_regexes=[], *args, **kwargs)
         self.regex_xpath = regex_xpath
 
     def matches(self, event):
-        new_regexes = []
         regex_values = self._get_value(event, self.event_scope, xpath=self.regex_xpath)
-        try:
-            while True:
-                regex = next(regex_values)
-                if regex is not None:
-                    new_regexes.append(regex)
-        except StopIteration:
-            pass
+        value_regexes = self.parse_value_regexes([regex for regex in regex_values if regex is not None])
+        return self._matches_regexes(event, value_regexes)
 
-        self.value_regexes = self.parse_value_regexes(new_regexes)
-        return super(EventXMLXpathsFilter, self).matches(event)
+    def parse_value_regexes(self, value_regexes):
+        compiled_regexes = self.compiled_regexes
+        parsed_regexes = []
+        for value_regex in value_regexes:
+            # Lookup results are str subclasses that reference their document, which should not be kept alive by the cache
+            value_regex = unicode(value_regex) if isinstance(value_regex, unicode) else str(value_regex)
+            parsed_regex = compiled_regexes.get(value_regex)
+            if parsed_regex is None:
+                parsed_regex = compiled_regexes[value_regex] = re.compile(value_regex)
+            parsed_regexes.append(parsed_regex)
+        return parsed_regexes
 
 
 class EventJSONFilter(EventFilter):
@@ -394,7 +722,7 @@ class EventJSONFilter(EventFilter):
         try:
 
             if isinstance(values, str):
-                values = json.loads(values)
+                values = get_json_codec().loads(values)
 
             if isinstance(values, list):
                 for value in values:
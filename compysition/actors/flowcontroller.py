@@ -21,10 +21,8 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-from uuid import uuid4 as uuid
-
 from compysition.actor import Actor
-from compysition.event import XMLEvent, JSONEvent
+from compysition.event import XMLEvent, JSONEvent, generate_id
 
 __all__ = [
     "FlowController",
@@ -53,7 +51,7 @@ class FlowController(Actor):
 
     def consume(self, event, *args, **kwargs):
         if self.generate_fresh_ids:
-            event._event_id = uuid().get_hex()
+            event._event_id = generate_id()
             event.meta_id = event._event_id
         if event.error and self.trigger_errors:
             self.send_error(event)
@@ -23,7 +23,6 @@
 
 from collections import defaultdict
 from datetime import datetime
-import json
 import mimeparse
 import re
 
@@ -33,7 +32,7 @@ from gevent.queue import Queue
 
 from compysition.actor import Actor
 from compysition.errors import InvalidEventDataModification, MalformedEventData, ResourceNotFound
-from compysition.event import HttpEvent, JSONHttpEvent, XMLHttpEvent
+from compysition.event import HttpEvent, JSONHttpEvent, XMLHttpEvent, RawData, get_json_codec
 
 BaseRequest.MEMFILE_MAX = 1024 * 1024 # (or whatever you want)
 
@@ -89,6 +88,10 @@ class HTTPServer(Actor, Bottle):
             | Special values:
             |    id(Optional[str]): Used to identify this route in the json object
             |    base_path(Optional[str]): Used to identify a route that this route extends, using the referenced id
+        lazy_parsing(Optional[bool]):
+            | Keep the request body unparsed on the event until event.data is first accessed. Pass-through flows then skip
+            | parsing and re-serializing the body, at the cost of malformed bodies only being detected once they are accessed
+            | Default: False
 
     Examples:
         Default:
@@ -178,7 +181,7 @@ class HTTPServer(Actor, Bottle):
 
         return path
 
-    def __init__(self, name, address="0.0.0.0", port=8080, keyfile=None, certfile=None, routes_config=None, send_errors=False, use_response_wrapper=True, *args, **kwargs):
+    def __init__(self, name, address="0.0.0.0", port=8080, keyfile=None, certfile=None, routes_config=None, send_errors=False, use_response_wrapper=True, lazy_parsing=False, *args, **kwargs):
         Actor.__init__(self, name, *args, **kwargs)
         Bottle.__init__(self)
         self.blockdiag_config["shape"] = "cloud"
@@ -189,10 +192,11 @@ class HTTPServer(Actor, Bottle):
         self.responders = {}
         self.send_errors = send_errors
         self.use_response_wrapper = use_response_wrapper
+        self.lazy_parsing = lazy_parsing
         routes_config = routes_config or self.DEFAULT_ROUTE
 
         if isinstance(routes_config, str):
-            routes_config = json.loads(routes_config)
+            routes_config = get_json_codec().loads(routes_config)
 
         if isinstance(routes_config, dict):
             named_routes = {route['id']:{'path': route['path'], 'base_path': route.get('base_path', None)} for route in routes_config.get('routes') if route.get('id', None)}
@@ -224,9 +228,12 @@ class HTTPServer(Actor, Bottle):
         """
         if event.error:
             if isinstance(event, JSONHttpEvent):
-                response_data = json.dumps({"errors": event.format_error()})
+                response_data = get_json_codec().dumps({"errors": event.format_error()})
             else:
                 response_data = event.error_string()
+        elif event.raw_data is not None and not isinstance(event, JSONHttpEvent):
+            # The data was never accessed, so it is returned exactly as it was received
+            response_data = event.raw_data
         else:
             if not isinstance(event.data, (list, dict, str)) or \
                     (isinstance(event.data, dict) and len(event.data) == 1 and event.data.get("data", None)):
@@ -252,7 +259,7 @@ class HTTPServer(Actor, Bottle):
 
                     response_dict.update({'_pagination': links})
 
-                response_data = json.dumps(response_dict)
+                response_data = get_json_codec().dumps(response_dict)
 
         return response_data
 
@@ -373,7 +380,8 @@ class HTTPServer(Actor, Bottle):
             if data == '':
                 data = None
 
-            event = event_class(environment=environment, service=queue_name, data=data, accept=accept, **kwargs)
+            event_data = RawData(data) if self.lazy_parsing and data is not None else data
+            event = event_class(environment=environment, service=queue_name, data=event_data, accept=accept, **kwargs)
         except (ResourceNotFound, InvalidEventDataModification, MalformedEventData) as err:
             event_class = event_class or JSONHttpEvent
             event = event_class(environment=environment, service=queue_name, accept=accept, **kwargs)
@@ -22,12 +22,11 @@
 #  MA 02110-1301, USA.
 
 import jsonschema
-import json
 
 from jsonschema import FormatChecker, ValidationError, SchemaError
 
 from compysition.actor import Actor
-from compysition.event import JSONEvent
+from compysition.event import JSONEvent, get_json_codec
 from compysition.errors import MalformedEventData
 
 def _required(validator, required, instance, schema):
@@ -80,7 +79,7 @@ class JSONValidator(Actor):
 
             try:
                 if isinstance(self.schema, str):
-                    self.schema = json.loads(self.schema)
+                    self.schema = get_json_codec().loads(self.schema)
 
                 if isinstance(self.schema, dict):
                     self.schema = Validator(self.schema, format_checker=formatter)
@@ -56,6 +56,54 @@ class SMTPOut(Actor):
         return address
 
     def consume(self, event, *args, **kwargs):
+        message = self.create_message(event)
+        if message is not None:
+            msg, to, from_address = message
+            try:
+                self.send(msg, to, from_address)
+            except Exception as err:
+                self.logger.error("Error sending message: {err}".format(err=traceback.format_exc()), event=event)
+            else:
+                self.log_sent(event, to, from_address)
+
+        self.send_event(event)
+
+    def consume_batch(self, events, origin=None, origin_queue=None, *args, **kwargs):
+        """
+        Sends every message of the batch over a single SMTP session, rather than connecting once per event
+        """
+        messages = []
+        for event in events:
+            try:
+                messages.append((event, self.create_message(event)))
+            except Exception as err:
+                self.consume_error(event, err, origin_queue)
+
+        sender = None
+        try:
+            for event, message in messages:
+                if message is not None:
+                    msg, to, from_address = message
+                    try:
+                        sender = sender or smtplib.SMTP(self.host)
+                        self.send(msg, to, from_address, sender=sender)
+                    except Exception as err:
+                        self.logger.error("Error sending message: {err}".format(err=traceback.format_exc()), event=event)
+                        # The session may be unusable after a failure, the next message is sent over a new one
+                        self.close_sender(sender)
+                        sender = None
+                    else:
+                        self.log_sent(event, to, from_address)
+        finally:
+            self.close_sender(sender)
+
+        for event, message in messages:
+            self.send_event(event)
+
+    def create_message(self, event):
+        """
+        Returns a tuple of (MIMEText, to, from_address) built from the event XML, or None if no recipient was specified
+        """
         msg_xml = event.data
         to = msg_xml.find("To").text
         from_element = msg_xml.find("From")
@@ -67,23 +115,32 @@ class SMTPOut(Actor):
                 if element.tag != self.body_tag:
                     msg[element.tag] = element.text
 
-            try:
-                self.send(msg, to, from_address)
-            except Exception as err:
-                self.logger.error("Error sending message: {err}".format(err=traceback.format_exc()), event=event)
-            else:
-                self.logger.info("Email sent to {to} from {from_address} via smtp server {host}".format(to=to,
-                                                                                                        from_address=from_address,
-                                                                                                        host=self.host), event=event)
+            return msg, to, from_address
         else:
             self.logger.info("No email recipient specified, notification was not sent", event=event)
+            return None
 
-        self.send_event(event)
+    def log_sent(self, event, to, from_address):
+        self.logger.info("Email sent to {to} from {from_address} via smtp server {host}".format(to=to,
+                                                                                                from_address=from_address,
+                                                                                                host=self.host), event=event)
 
-    def send(self, msg, to, from_address):
-        sender = smtplib.SMTP(self.host)
-        sender.sendmail(from_address, to.split(","), msg.as_string())
-        sender.quit()
+    def close_sender(self, sender):
+        if sender is not None:
+            try:
+                sender.quit()
+            except Exception:
+                try:
+                    sender.close()
+                except Exception:
+                    pass
+
+    def send(self, msg, to, from_address, sender=None):
+        """Sends msg over the SMTP session sender, or over a session of its own if no sender is given"""
+        session = sender or smtplib.SMTP(self.host)
+        session.sendmail(from_address, to.split(","), msg.as_string())
+        if sender is None:
+            session.quit()
 
 """
 # NOT FUNCTIONING
@@ -1,7 +1,33 @@
 import re
 
+from contextlib import contextmanager
+from gevent.local import local
 from lxml import etree
 
+from compysition.cache import LRUCache
+
+# Compiled XPath evaluators, keyed by the xpath and the namespaces it is compiled with
+_compiled_xpaths = LRUCache(maxsize=256)
+
+# The namespaces of the documents looked up within the current greenlet's document_scope, by id(document) (See document_scope)
+_scope = local()
+
+
+@contextmanager
+def document_scope():
+    """
+    Within the scope, the lookups on the same document in the current greenlet (such as the filters of an EventRouter
+    routing a single event) discover its namespaces only once. The documents must not be modified within the scope, as
+    they are only released once it exits
+    """
+    previous = getattr(_scope, "documents", None)
+    _scope.documents = {}
+    try:
+        yield
+    finally:
+        _scope.documents = previous
+
+
 class XPathLookup(object):
     """
     Wrapper class that auto populates an xpath lookup with the default namespace, if defined by the provided xml.
@@ -13,6 +39,15 @@ class XPathLookup(object):
         self.__initialize_namespaces(self.xml)
 
     def __initialize_namespaces(self, xml):
+        documents = getattr(_scope, "documents", None)
+        if documents is not None:
+            # The document is kept along with its namespaces, so that its id is not reused within the scope
+            document = documents.get(id(xml))
+            if document is not None:
+                self.__namespaces, self.__namespaces_key = document[1:]
+                self.namespaces = dict(self.__namespaces)
+                return
+
         self.namespaces = {}
 
         for key in xml.nsmap:
@@ -28,6 +63,11 @@ class XPathLookup(object):
                 else:
                     self.namespaces.update({key: element.nsmap[key]})
 
+        self.__namespaces = dict(self.namespaces)
+        self.__namespaces_key = tuple(sorted(self.namespaces.iteritems()))
+        if documents is not None:
+            documents[id(xml)] = (xml, self.__namespaces, self.__namespaces_key)
+
     def lookup(self, xpath):
         """
         Function that auto populates the default namespace of any given xpath lookup
@@ -66,7 +106,21 @@ class XPathLookup(object):
                 It will not, at this time, recursively check for each child nodes default ns and map accordingly
         """
 
-        if self.namespaces.get("default", None):
-            xpath = re.sub(r'\/(?!\/|([\w{0, }]\:[\w{0, }]))', r'/default:', xpath)
+        return self.compile(xpath)(self.xml)
+
+    def compile(self, xpath):
+        """Returns the compiled etree.XPath for xpath with the namespaces of this document, compiling it only on first use"""
+        namespaces = self.namespaces
+        if namespaces == self.__namespaces:
+            namespaces_key = self.__namespaces_key
+        else:
+            # The namespaces were modified after the lookup was created
+            namespaces_key = tuple(sorted(namespaces.iteritems()))
 
-        return self.xml.xpath(xpath, namespaces=self.namespaces)
\ No newline at end of file
+        key = (xpath, namespaces_key)
+        compiled = _compiled_xpaths.get(key)
+        if compiled is None:
+            if namespaces.get("default", None):
+                xpath = re.sub(r'\/(?!\/|([\w{0, }]\:[\w{0, }]))', r'/default:', xpath)
+            compiled = _compiled_xpaths[key] = etree.XPath(xpath, namespaces=dict(namespaces))
+        return compiled
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  cache.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+_PREVIOUS, _NEXT, _KEY, _VALUE = 0, 1, 2, 3
+
+
+class LRUCache(object):
+    """
+    **A mapping that holds at most maxsize entries, evicting the least recently used entry once it is full**
+
+    Entries are kept in a circular doubly linked list (oldest first) of [previous, next, key, value] links, so that a hit
+    only relinks a single list rather than reordering a (pure Python) OrderedDict
+
+    Parameters:
+        maxsize (Optional[int]):
+            | The max amount of entries held
+            | (Default: 128)
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.__links = {}
+        self.__root = root = []
+        root[:] = [root, root, None, None]
+
+    def __len__(self):
+        return len(self.__links)
+
+    def __contains__(self, key):
+        return key in self.__links
+
+    def get(self, key, default=None):
+        link = self.__links.get(key)
+        if link is None:
+            return default
+
+        self.__unlink(link)
+        self.__append(link)
+        return link[_VALUE]
+
+    def __setitem__(self, key, value):
+        links = self.__links
+        link = links.pop(key, None)
+        if link is not None:
+            self.__unlink(link)
+        elif len(links) >= self.maxsize:
+            oldest = self.__root[_NEXT]
+            self.__unlink(oldest)
+            del links[oldest[_KEY]]
+
+        link = links[key] = [None, None, key, value]
+        self.__append(link)
+
+    def clear(self):
+        self.__links.clear()
+        root = self.__root
+        root[:] = [root, root, None, None]
+
+    @staticmethod
+    def __unlink(link):
+        previous, following = link[_PREVIOUS], link[_NEXT]
+        previous[_NEXT] = following
+        following[_PREVIOUS] = previous
+
+    def __append(self, link):
+        root = self.__root
+        last = root[_PREVIOUS]
+        link[_PREVIOUS] = last
+        link[_NEXT] = root
+        last[_NEXT] = root[_PREVIOUS] = link
@@ -203,6 +203,13 @@ class Director(object):
     def is_running(self):
         return self.__running
 
+    def metrics(self):
+        """Returns a snapshot of the runtime metrics of every actor (See Actor.metrics), by actor name"""
+        actors = dict(self.actors)
+        for actor in (self.log_actor, self.error_actor):
+            actors[actor.name] = actor
+        return {name: actor.metrics() for name, actor in actors.iteritems()}
+
     def start(self, block=True):
         '''Starts all registered actors.'''
         self.__running = True
@@ -20,23 +20,26 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 #
+import os
 import json
 import traceback
 import re
 import xmltodict
 
 from uuid import uuid4 as uuid
+from itertools import count
 from lxml import etree
 from copy import deepcopy
 from datetime import datetime
 from decimal import Decimal
 from collections import OrderedDict, defaultdict
 from xml.parsers import expat
-from xml.sax.saxutils import XMLGenerator
+from xml.sax.saxutils import XMLGenerator, quoteattr
 
+from .cache import LRUCache
 from .errors import (ResourceNotModified, MalformedEventData, InvalidEventDataModification, UnauthorizedEvent,
     ForbiddenEvent, ResourceNotFound, EventCommandNotAllowed, ActorTimeout, ResourceConflict, ResourceGone,
-    UnprocessableEventData, EventRateExceeded, CompysitionException, ServiceUnavailable)
+    UnprocessableEventData, EventRateExceeded, CompysitionException, ServiceUnavailable, InvalidEventConversion)
 
 """
 Compysition event is created and passed by reference among actors
@@ -63,12 +66,170 @@ def remove_internal_xmlify(_json):
             _json = value
     return _json
 
+class UUIDGenerator(object):
+    """
+    Generates a random uuid4 hex string per event id. Unique without any coordination, but costs a call to os.urandom per id
+    """
+
+    def __call__(self):
+        return uuid().get_hex()
+
+
+class CounterIDGenerator(object):
+    """
+    Generates event ids from a random per-process prefix and an incrementing counter. The ids are 32 hex characters, the
+    same as a uuid4 hex string, and stay unique across processes as the prefix is drawn anew in every (forked) process
+    """
+
+    def __init__(self):
+        self.__pid = None
+
+    def __reset(self):
+        self.__pid = os.getpid()
+        self.__prefix = uuid().get_hex()[:16]
+        self.__counter = count()
+
+    def __call__(self):
+        if self.__pid != os.getpid():
+            self.__reset()
+        return "%s%016x" % (self.__prefix, next(self.__counter))
+
+
+_id_generator = CounterIDGenerator()
+
+
+def generate_id():
+    """Returns a new unique event id from the configured id generator (See set_id_generator)"""
+    return _id_generator()
+
+
+def set_id_generator(generator):
+    """
+    Replaces the generator used for all new event ids. generator may be any callable that returns a unique string,
+    such as an instance of CounterIDGenerator (the default) or UUIDGenerator
+    """
+    global _id_generator
+    _id_generator = generator
+
+
+class _SharedData(object):
+    """
+    Reference count of the events that currently hold the same data object after a copy-on-write fan out.
+    Every owner except the last copies the data upon first access, the last owner takes the data as-is
+    """
+
+    __slots__ = ("owners",)
+
+    def __init__(self):
+        self.owners = 1
+
+
+class RawData(object):
+    """
+    Wraps serialized event data, such as a request body, so that it is only parsed once event.data is accessed.
+    Until then, serializing the event reuses the raw data as-is. Usage: XMLEvent(data=RawData("<root/>"))
+    """
+
+    __slots__ = ("raw",)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+
 class NullLookupValue(object):
 
     def get(self, key, value=None):
         return self
 
 
+_NULL_LOOKUP_VALUE = NullLookupValue()
+_MISSING = object()
+
+
+class PathAccessor(object):
+    """
+    The compiled form of an Event.lookup path. Each step of the path is a dict key, an object attribute or a list index
+    (given as an int or a numeric string). The common cases of dicts, lists and events are dispatched by type, so that
+    only other objects (and misses) go through the generic step that tries all three
+    """
+
+    __slots__ = ("path", "_steps")
+
+    def __init__(self, path):
+        if isinstance(path, basestring):
+            path = (path, )
+        self.path = tuple(path)
+        self._steps = tuple((key, self._get_index(key)) for key in self.path)
+
+    @staticmethod
+    def _get_index(key):
+        try:
+            return int(key)
+        except (TypeError, ValueError):
+            return None
+
+    def __call__(self, obj):
+        for key, index in self._steps:
+            cls = obj.__class__
+            if cls is dict or cls is OrderedDict:
+                value = obj.get(key, _MISSING)
+            elif cls is list or cls is tuple:
+                value = obj[index] if index is not None and -len(obj) <= index < len(obj) else _MISSING
+            elif isinstance(obj, Event) and isinstance(key, basestring):
+                value = getattr(obj, key, _MISSING)
+            else:
+                value = _MISSING
+
+            if value is _MISSING:
+                value = self._generic_step(obj, key)
+                if value is _NULL_LOOKUP_VALUE:
+                    return None
+            obj = value
+
+        if isinstance(obj, NullLookupValue):
+            return None
+        return obj
+
+    @staticmethod
+    def _generic_step(obj, key):
+        default = _NULL_LOOKUP_VALUE
+        try:
+            default = obj[int(key)]
+        except (ValueError, IndexError, TypeError, KeyError, AttributeError):
+            pass
+
+        try:
+            default = getattr(obj, key, default)
+        except TypeError:
+            pass
+
+        try:
+            return obj.get(key, default)
+        except (TypeError, AttributeError):
+            return default
+
+
+_path_accessors = LRUCache(maxsize=1024)
+
+
+def get_path_accessor(path, accessor_class=PathAccessor):
+    """Returns the accessor of accessor_class for path, compiling it only on first use"""
+    key = (accessor_class, path if isinstance(path, basestring) else tuple(path))
+    accessor = _path_accessors.get(key)
+    if accessor is None:
+        accessor = _path_accessors[key] = accessor_class(key[1])
+    return accessor
+
+
+class EscapedText(unicode):
+    """
+    Marks a text value as text, so that it is always escaped when converting to XML, even if it is well formed XML itself.
+    Fields that are known to hold markup as text (such as escaped HTML) skip the embedded XML detection this way
+    """
+
+    __slots__ = ()
+
+
 class UnescapedDictXMLGenerator(XMLGenerator):
     """
     Simple class designed to enable the use of an unescaped functionality
@@ -76,14 +237,9 @@ class UnescapedDictXMLGenerator(XMLGenerator):
     """
 
     def characters(self, content):
-        try:
-            if content.lstrip().startswith("<"):
-                etree.fromstring(content)
-                self._write(content)
-            else:
-                XMLGenerator.characters(self, content)
-        except (AttributeError, Exception):
-            #TODO could be more specific on errors caught
+        if isinstance(content, basestring) and is_embedded_xml(content):
+            self._write(content)
+        else:
             XMLGenerator.characters(self, content)
 
 setattr(xmltodict, "XMLGenerator", UnescapedDictXMLGenerator)
@@ -96,7 +252,8 @@ class DataFormatInterface(object):
     Interface used as an identifier for data format classes. Used during event type conversion
     To create a new datatype, simply implement this interface on the newly created class
     """
-    pass
+
+    __slots__ = ()
 
 
 class Event(object):
@@ -109,18 +266,27 @@ class Event(object):
         - data:     <The data passed and worked on from event to event. Mutable and variable>
         - kwargs:   All other kwargs passed upon Event instantiation will be added to the event dictionary
 
+    The core properties are stored in slots, so an event only allocates a dictionary once a property outside of
+    __slots__ is set (such as a kwarg). Subclasses that add core properties should extend both __slots__ and _properties
     """
 
+    __slots__ = ("_event_id", "meta_id", "service", "_data", "_error", "created", "__dict__")
+
+    # The names that get_properties, pickling and conversion carry over, in addition to the event dictionary
+    _properties = ("_event_id", "meta_id", "service", "_error", "created")
+
     _content_type = "text/plain"
+    _shared_data = None
+    _alternate_data = None
 
     def __init__(self, meta_id=None, service=None, data=None, *args, **kwargs):
-        self.event_id = uuid().get_hex()
+        self.event_id = generate_id()
         self.meta_id = meta_id if meta_id else self.event_id
         self.service = service or DEFAULT_EVENT_SERVICE
         self.data = data
         self.error = None
         self.created = datetime.now()
-        self.__dict__.update(kwargs)
+        self._set_properties(kwargs)
 
     def set(self, key, value):
         try:
@@ -137,12 +303,26 @@ class Event(object):
 
     @property
     def data(self):
+        if self._data.__class__ is RawData:
+            self.data = self._data.raw
+        elif self._shared_data is not None and self._release_data():
+            self._data = deepcopy(self._data)
+
+        if self._alternate_data is not None:
+            # The data may be modified once it has been handed out
+            self.data_modified()
         return self._data
 
     @data.setter
     def data(self, data):
+        if data.__class__ is RawData:
+            self._release_data()
+            self.data_modified()
+            self._data = data
+            return
+
         try:
-            self._data = self.conversion_methods[data.__class__](data)
+            data = self.conversion_methods[data.__class__](data)
         except KeyError:
             raise InvalidEventDataModification("Data of type '{_type}' was not valid for event type {cls}: {err}".format(_type=type(data),
                                                                                           cls=self.__class__, err=traceback.format_exc()))
@@ -151,6 +331,65 @@ class Event(object):
         except Exception as err:
             raise InvalidEventDataModification("Unknown error occurred on modification: {err}".format(err=err))
 
+        self._release_data()
+        self.data_modified()
+        self._data = data
+
+    def data_modified(self):
+        """
+        Discards the representation of the data in another format that was kept by the last conversion (See convert).
+        Accessing or assigning event.data does so implicitly, so this only needs to be called by code that modifies _data directly
+        """
+        alternate = self._alternate_data
+        if alternate is not None:
+            del self._alternate_data
+            if alternate[2] is not None:
+                alternate[2].owners -= 1
+
+    @property
+    def raw_data(self):
+        """The serialized data this event was created with, or None if event.data has been parsed since (See RawData)"""
+        if self._data.__class__ is RawData:
+            return self._data.raw
+        return None
+
+    def _release_data(self):
+        """
+        Gives up this event's share of copy-on-write data. Returns True if other events still reference the same data
+        """
+        shared = self._shared_data
+        if shared is not None:
+            del self._shared_data
+            shared.owners -= 1
+            return shared.owners > 0
+        return False
+
+    def fork(self, copies=1):
+        """
+        Creates 'copies' new events that share this event's data until one of them accesses or modifies event.data.
+        All other event properties are copied immediately, as they are typically small compared to the data
+        """
+        if copies < 1:
+            return []
+
+        shared = self._shared_data
+        if shared is None:
+            shared = self._shared_data = _SharedData()
+        shared.owners += copies
+
+        properties = self.get_properties()
+        forks = []
+        for _ in xrange(copies):
+            fork = self.__class__.__new__(self.__class__)
+            fork._set_properties(deepcopy(properties))
+            fork._data = self._data
+            fork._shared_data = shared
+            if self._alternate_data is not None:
+                fork._alternate_data = self._share_alternate()
+            forks.append(fork)
+
+        return forks
+
     @property
     def event_id(self):
         return self._event_id
@@ -162,53 +401,72 @@ class Event(object):
         else:
             self._event_id = event_id
 
-    def _list_get(self, obj, key, default):
-        try:
-            return obj[int(key)]
-        except (ValueError, IndexError, TypeError, KeyError, AttributeError) as e:
-            return default
-
-    def _getattr(self, obj, key, default):
-        try:
-            return getattr(obj, key, default)
-        except TypeError as e:
-            return default
-
-    def _obj_get(self, obj, key, default):
-        try:
-            return obj.get(key, default)
-        except (TypeError, AttributeError) as e:
-            return default
-
     def lookup(self, path):
         """
-        Implements the retrieval of a single list index through an integer path entry
+        Implements the retrieval of a single list index through an integer path entry (See PathAccessor)
         """
-        if isinstance(path, str):
-            path = [path]
-
-        value = reduce(lambda obj, key: self._obj_get(obj, key, self._getattr(obj, key, self._list_get(obj, key, NullLookupValue()))), [self] + path)
-        if isinstance(value, NullLookupValue):
-            value = None
-        return value
+        return get_path_accessor(path)(self)
 
     def get_properties(self):
         """
         Gets a dictionary of all event properties except for event.data
         Useful when event data is too large to copy in a performant manner
         """
-        return {k: v for k, v in self.__dict__.iteritems() if k != "data" and k != "_data"}
+        properties = {k: v for k, v in self.__dict__.iteritems() if k not in ("data", "_data", "_shared_data", "_alternate_data")}
+        for name in self._properties:
+            try:
+                properties[name] = getattr(self, name)
+            except AttributeError:
+                # An optional property that was never set
+                pass
+        return properties
+
+    def _set_properties(self, properties):
+        for name, value in properties.iteritems():
+            setattr(self, name, value)
 
     def __getstate__(self):
-        return dict(self.__dict__)
+        state = self._get_copy_state()
+        alternate = self._alternate_data
+        if alternate is not None:
+            # Pickles keep the data in the previous format as well, so that the unpickled event may still convert back cheaply
+            cls, data = alternate[0], alternate[1]
+            state['_alternate_data'] = (cls, data.raw if data.__class__ is RawData else cls._serialize_data(data))
+        return state
+
+    def _get_copy_state(self):
+        state = self.get_properties()
+        state['_data'] = self._data.raw if self._data.__class__ is RawData else self._serialize_data(self._data)
+        return state
+
+    def __deepcopy__(self, memo):
+        copy = memo[id(self)] = self.__class__.__new__(self.__class__)
+        copy.__setstate__(deepcopy(self._get_copy_state(), memo))
+        if self._alternate_data is not None:
+            # Rather than being serialized, the data kept in another format is shared with the copy (See fork)
+            copy._alternate_data = self._share_alternate()
+        return copy
 
     def __setstate__(self, state):
-        self.__dict__ = state
-        self.data = state['_data']
-        self.error = state.get('_error', None)
+        state = dict(state)
+        data = state.pop('_data', None)
+        error = state.pop('_error', None)
+        alternate = state.pop('_alternate_data', None)
+        self._set_properties(state)
+        # Serialized data is only parsed again if the receiving end accesses it
+        self.data = RawData(data) if isinstance(data, str) else data
+        self.error = error
+        if alternate is not None:
+            cls, data = alternate
+            self._alternate_data = (cls, RawData(data) if isinstance(data, str) else data, None)
+
+    @classmethod
+    def _serialize_data(cls, data):
+        """Returns data in the form that pickling and copying an event of this class keep it in"""
+        return data
 
     def __str__(self):
-        return str(self.__getstate__())
+        return str(self._get_copy_state())
 
     @property
     def error(self):
@@ -245,29 +503,66 @@ class Event(object):
             return None
 
     def data_string(self):
+        if self._data.__class__ is RawData:
+            return self._data.raw
         return str(self.data)
 
     def convert(self, convert_to):
-        if issubclass(convert_to, self.__class__):
-            # Widening conversion
-            new_class = convert_to
+        """
+        Converts this event to an instance of 'convert_to', or to the registered class that combines 'convert_to' with
+        this event's class (See register_event_class). If the data format changes, the new event keeps the data in the
+        previous format, so that converting back before the data is accessed or modified does not convert the data again
+        """
+        new_class, same_format = get_conversion_plan(self.__class__, convert_to)
+        new_event = new_class.__new__(new_class)
+        new_event._set_properties(self.get_properties())
+        alternate = self._alternate_data
+        if same_format:
+            # The data is already valid for the new class, unparsed raw data included
+            new_event._data = self._data if self._data.__class__ is RawData else self._peek_data()
+            if alternate is not None:
+                new_event._alternate_data = self._share_alternate()
         else:
-            if not issubclass(self.__class__, convert_to):
-                # A complex widening conversion
-                bases = tuple([convert_to] + filter(lambda cls: not issubclass(cls, DataFormatInterface) and not issubclass(convert_to, cls), list(self.__class__.__bases__) + [self.__class__]))
-                if len(bases) == 1:
-                    new_class = bases[0]
-                else:
-                    new_class = filter(lambda cls: cls.__bases__ == bases, built_classes)[0]
+            converts_back = alternate is not None and alternate[0].conversion_methods is new_class.conversion_methods
+            if converts_back and self._data.__class__ is RawData:
+                # Raw data is never modified, and is only parsed once either event accesses it
+                data, shared = self._data, None
             else:
-                # This is an attempted narrowing conversion
-                raise InvalidEventConversion("Narrowing event conversion attempted, this is not allowed <Attempted {old} -> {new}>".format(
-                        old=self.__class__, new=convert_to))
-
-        new_class = new_class.__new__(new_class)
-        new_class.__dict__.update(self.__dict__)
-        new_class.data = self.data
-        return new_class
+                # This event and the new event's alternate hold the same data, so either copies it before modifying it (See fork)
+                data = self._peek_data()
+                shared = self._shared_data
+                if shared is None:
+                    shared = self._shared_data = _SharedData()
+                shared.owners += 1
+
+            if converts_back:
+                new_event._data, new_event._shared_data = self._share_alternate()[1:]
+            else:
+                new_event.data = data
+            new_event._alternate_data = (self.__class__, data, shared)
+        return new_event
+
+    def _peek_data(self):
+        """Returns the data for reading, without discarding the data kept in another format"""
+        alternate = self._alternate_data
+        if alternate is not None:
+            del self._alternate_data
+        data = self.data
+        if alternate is not None:
+            self._alternate_data = alternate
+        return data
+
+    def _share_alternate(self):
+        """
+        Returns the data kept in another format as (event class, data, shared data), counting the event that is handed it
+        as one more owner of the data, so that each of its holders copies it before modifying it (See fork)
+        """
+        cls, data, shared = self._alternate_data
+        if shared is None:
+            shared = _SharedData()
+            self._alternate_data = (cls, data, shared)
+        shared.owners += 1
+        return self._alternate_data
 
     def clone(self):
         return deepcopy(self)
@@ -275,16 +570,34 @@ class Event(object):
 
 class HttpEvent(Event):
 
+    __slots__ = ("_headers", "method", "_status", "environment", "_pagination")
+    # Unset headers are skipped, rather than created by copying or converting the event (See headers)
+    _properties = Event._properties + ("_headers", "method", "_status", "environment", "_pagination")
+
     content_type = "text/plain"
 
     def __init__(self, headers=None, status=(200, "OK"), environment={}, pagination=None, *args, **kwargs):
-        self.headers = headers or {}
+        if headers:
+            self.headers = headers
         self.method = environment.get('REQUEST_METHOD', None)
         self.status = status
         self.environment = environment
         self._pagination = pagination
         super(HttpEvent, self).__init__(*args, **kwargs)
 
+    @property
+    def headers(self):
+        # Most events never carry headers, so the dictionary is only created once it is accessed
+        try:
+            return self._headers
+        except AttributeError:
+            self._headers = {}
+            return self._headers
+
+    @headers.setter
+    def headers(self, headers):
+        self._headers = headers
+
     @property
     def status(self):
         return self._status
@@ -321,19 +634,22 @@ class HttpEvent(Event):
 
 class _XMLFormatInterface(DataFormatInterface):
 
+    __slots__ = ()
+
     content_type = "application/xml"
 
     conversion_methods = {str: lambda data: etree.fromstring(data)}
     conversion_methods.update(dict.fromkeys(_XML_TYPES, lambda data: data))
-    conversion_methods.update(dict.fromkeys(_JSON_TYPES, lambda data: etree.fromstring(xmltodict.unparse(internal_xmlify(data)).encode('utf-8'))))
+    conversion_methods.update(dict.fromkeys(_JSON_TYPES, lambda data: dict_to_etree(internal_xmlify(data))))
     conversion_methods.update({None.__class__: lambda data: etree.fromstring("<root/>")})
 
-    def __getstate__(self):
-        state = super(_XMLFormatInterface, self).__getstate__()
-        state['_data'] = etree.tostring(self.data)
-        return state
+    @classmethod
+    def _serialize_data(cls, data):
+        return etree.tostring(data)
 
     def data_string(self):
+        if self._data.__class__ is RawData:
+            return self._data.raw
         return etree.tostring(self.data)
 
     def format_error(self):
@@ -373,6 +689,147 @@ def decimal_default(obj):
         return float(obj)
     raise TypeError
 
+
+class StandardJSONCodec(object):
+    """
+    Encodes and decodes event data with the stdlib json module. Every codec encodes Decimals as floats (See decimal_default)
+    and produces the same output as this one, byte for byte
+    """
+
+    name = "json"
+
+    def dumps(self, data):
+        return json.dumps(data, default=decimal_default)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class SimpleJSONCodec(StandardJSONCodec):
+    """
+    Encodes event data with the C speedups of simplejson, configured to match the stdlib output. Decoding stays with the
+    stdlib, as simplejson decodes ASCII strings to str rather than unicode. Raises ImportError if simplejson or its
+    speedups are not installed
+    """
+
+    name = "simplejson"
+
+    def __init__(self):
+        import simplejson
+        if simplejson.encoder.c_make_encoder is None:
+            raise ImportError("simplejson is installed without its C speedups")
+
+        self.__encoder = simplejson.JSONEncoder(default=decimal_default, use_decimal=False, namedtuple_as_object=False)
+
+    def dumps(self, data):
+        return self.__encoder.encode(data)
+
+
+def select_json_codec(candidates=(SimpleJSONCodec, StandardJSONCodec)):
+    """Returns an instance of the first of candidates that is installed"""
+    for candidate in candidates:
+        try:
+            return candidate()
+        except ImportError:
+            pass
+    return StandardJSONCodec()
+
+
+_json_codec = select_json_codec()
+
+
+def get_json_codec():
+    """Returns the codec used to encode and decode JSON event data and responses (See set_json_codec)"""
+    return _json_codec
+
+
+def set_json_codec(codec):
+    """
+    Replaces the codec selected at startup (See select_json_codec). codec may be any object with dumps and loads methods
+    that produce the same output as StandardJSONCodec
+    """
+    global _json_codec
+    _json_codec = codec
+
+
+# The classes that normalize_json keeps as they are, checked by exact class first as they make up most JSON data
+_JSON_LEAF_CLASSES = frozenset((unicode, int, long, float, bool, NoneType))
+
+
+def normalize_json(data):
+    """
+    Returns a copy of data in the form json.loads(json.dumps(data, default=decimal_default)) would return it, by walking
+    the structure once rather than serializing and parsing it: byte strings are decoded, tuples become lists, Decimals
+    become floats and keys become strings. Raises TypeError for any value that is not JSON serializable.
+    Unlike the round trip, unicode subclasses (such as EscapedText) and the order of an OrderedDict are kept
+    """
+    cls = data.__class__
+    if cls in _JSON_LEAF_CLASSES:
+        return data
+    elif cls is dict or cls is OrderedDict or isinstance(data, dict):
+        normalized = OrderedDict() if isinstance(data, OrderedDict) else {}
+        for key, value in data.iteritems():
+            if key.__class__ is str:
+                key = unicode(key, "utf-8")
+            elif key.__class__ is not unicode:
+                key = _normalize_json_key(key)
+
+            value_cls = value.__class__
+            if value_cls is str:
+                value = unicode(value, "utf-8")
+            elif value_cls not in _JSON_LEAF_CLASSES:
+                value = normalize_json(value)
+            normalized[key] = value
+        return normalized
+    elif cls is list or isinstance(data, (list, tuple)):
+        normalized = []
+        for item in data:
+            item_cls = item.__class__
+            if item_cls is str:
+                item = unicode(item, "utf-8")
+            elif item_cls not in _JSON_LEAF_CLASSES:
+                item = normalize_json(item)
+            normalized.append(item)
+        return normalized
+    elif isinstance(data, str):
+        return unicode(data, "utf-8")
+    elif isinstance(data, Decimal):
+        return float(data)
+    elif isinstance(data, (unicode, int, long, float)):
+        return data
+    raise TypeError("{data!r} is not JSON serializable".format(data=data))
+
+
+def _normalize_json_key(key):
+    if isinstance(key, unicode):
+        return key
+    elif isinstance(key, str):
+        return unicode(key, "utf-8")
+    elif key is None or isinstance(key, (int, long, float)):
+        # Covers booleans and the string forms of special floats as well
+        return unicode(json.dumps(key))
+    raise TypeError("key {key!r} is not a string".format(key=key))
+
+
+_trust_json_data = False
+
+
+def _json_data(data):
+    if _trust_json_data:
+        return data
+    return normalize_json(data)
+
+
+def set_json_data_trusted(trusted):
+    """
+    When trusted, dicts and lists assigned to JSON event data are stored as they are, without being validated or copied
+    (See normalize_json). This suits pipelines whose actors only assign JSON serializable data that they do not share
+    with other events, and leaves any Decimal to be converted when the data is serialized
+    """
+    global _trust_json_data
+    _trust_json_data = trusted
+
+
 def should_force_list(path, key, value):
     """
     This is a callback passed to xmltodict.parse which checks for an xml attribute force_list in the XML, and if present
@@ -410,47 +867,323 @@ def should_force_list(path, key, value):
         return False
 
 
+_XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
+
+def etree_to_dict(element, force_list=None):
+    """
+    Converts an lxml element (or element tree) to the same OrderedDict that
+    xmltodict.parse(etree.tostring(element), force_list=force_list) returns, by walking the element directly rather than
+    serializing and reparsing it. force_list is an optional callable with the xmltodict signature (path, key, value)
+    """
+    if isinstance(element, etree._ElementTree):
+        element = element.getroot()
+    name, value = _element_to_item(element, [], force_list, {})
+    return _push_item(None, name, value, [], force_list)
+
+
+def _push_item(item, key, value, path, force_list):
+    if item is None:
+        item = OrderedDict()
+
+    try:
+        existing = item[key]
+    except KeyError:
+        if force_list is not None and force_list(path[:], key, value):
+            item[key] = [value]
+        else:
+            item[key] = value
+    else:
+        if isinstance(existing, list):
+            existing.append(value)
+        else:
+            item[key] = [existing, value]
+    return item
+
+
+def _qualified_name(name, nsmap):
+    """Maps an lxml '{uri}local' name back to the 'prefix:local' name it was serialized with"""
+    uri, local = name[1:].split("}", 1)
+    if uri == _XML_NAMESPACE:
+        return "xml:" + local
+    for prefix, namespace in nsmap.iteritems():
+        if namespace == uri and prefix:
+            return prefix + ":" + local
+    return local
+
+
+def _element_to_item(element, path, force_list, parent_nsmap):
+    nsmap = element.nsmap
+    tag = element.tag
+    if tag[0] == "{":
+        name = element.prefix + ":" + tag[tag.index("}") + 1:] if element.prefix else tag[tag.index("}") + 1:]
+    else:
+        name = tag
+
+    attributes = None
+    if nsmap != parent_nsmap:
+        # Namespace declarations are serialized (and so reported by xmltodict) as attributes, ahead of any others
+        declarations = [(prefix, uri) for prefix, uri in nsmap.iteritems() if parent_nsmap.get(prefix) != uri]
+        if len(declarations) > 1:
+            declarations = _in_declaration_order(element, declarations)
+        attributes = OrderedDict(("xmlns:" + prefix if prefix else "xmlns", unicode(uri)) for prefix, uri in declarations)
+    if element.attrib:
+        attributes = attributes or OrderedDict()
+        for key, value in element.attrib.iteritems():
+            attributes[_qualified_name(key, nsmap) if key[0] == "{" else key] = unicode(value)
+
+    if attributes:
+        item = OrderedDict(("@" + key, value) for key, value in attributes.iteritems())
+    else:
+        item = attributes = None
+
+    text = [element.text] if element.text else []
+    path.append((name, attributes))
+    for child in element:
+        if isinstance(child.tag, basestring):
+            child_name, child_value = _element_to_item(child, path, force_list, nsmap)
+            item = _push_item(item, child_name, child_value, path, force_list)
+        # Comments and processing instructions are dropped, but the text that follows them is not
+        if child.tail:
+            text.append(child.tail)
+    path.pop()
+
+    data = unicode("".join(text).strip()) or None if text else None
+    if item is None:
+        return name, data
+    if data:
+        _push_item(item, "#text", data, path, force_list)
+    return name, item
+
+
+def _in_declaration_order(element, declarations):
+    """Sorts the (prefix, uri) namespace declarations of element in the order they are written in on the element"""
+    order = {}
+    for event, value in etree.iterwalk(element, events=("start-ns", "start")):
+        if event == "start":
+            break
+        order[value[0] or None] = len(order)
+    # The namespaces that the root of a subtree inherited are declared after its own
+    return sorted(declarations, key=lambda declaration: (order.get(declaration[0], len(order)), declaration[0]))
+
+
+def dict_to_etree(data):
+    """
+    Builds the same lxml element that etree.fromstring(xmltodict.unparse(data)) returns, including the passthrough of
+    text values that are XML themselves (See UnescapedDictXMLGenerator), by creating the elements directly rather than
+    rendering and reparsing a string
+    """
+    if len(data) != 1:
+        raise ValueError("Document must have exactly one root.")
+
+    key, value = next(data.iteritems())
+    values = _as_values(value)
+    if len(values) != 1:
+        raise ValueError("Document must have exactly one root.")
+    return _build_element(None, key, values[0], {"xml": _XML_NAMESPACE})
+
+
+def _as_values(value):
+    if not hasattr(value, "__iter__") or isinstance(value, (basestring, dict)):
+        return [value]
+    return list(value)
+
+
+def _resolve_name(name, scope, default_namespace):
+    if ":" in name:
+        prefix, local = name.split(":", 1)
+        try:
+            return "{%s}%s" % (scope[prefix], local)
+        except KeyError:
+            raise ValueError("Namespace prefix {prefix} on {name} is not defined".format(prefix=prefix, name=local))
+    if default_namespace and scope.get(None):
+        return "{%s}%s" % (scope[None], name)
+    return name
+
+
+def _build_element(parent, key, value, scope):
+    if value is None:
+        value = {}
+    elif isinstance(value, bool):
+        value = u"true" if value else u"false"
+    elif not isinstance(value, (basestring, dict)):
+        value = unicode(value)
+
+    if isinstance(value, basestring):
+        value = {"#text": value}
+
+    text = None
+    declarations = OrderedDict()
+    attributes = []
+    children = []
+    for child_key, child_value in value.iteritems():
+        if child_key == "#text":
+            text = child_value
+        elif child_key.startswith("@"):
+            name = child_key[1:]
+            if name == "xmlns" and isinstance(child_value, dict):
+                for prefix, uri in child_value.iteritems():
+                    declarations[prefix or None] = uri
+            elif name == "xmlns":
+                declarations[None] = child_value
+            elif name.startswith("xmlns:"):
+                declarations[name[6:]] = child_value
+            else:
+                attributes.append((name, child_value))
+        else:
+            children.append((child_key, child_value))
+
+    if declarations:
+        scope = dict(scope, **{prefix: uri for prefix, uri in declarations.iteritems() if prefix is not None})
+        if None in declarations:
+            scope[None] = declarations[None]
+
+    tag = _resolve_name(key, scope, True)
+    nsmap = OrderedDict((prefix, uri) for prefix, uri in declarations.iteritems() if uri) or None
+    if parent is None:
+        element = etree.Element(tag, nsmap=nsmap)
+    else:
+        element = etree.SubElement(parent, tag, nsmap=nsmap)
+
+    for name, attribute in attributes:
+        element.set(_resolve_name(name, scope, False), attribute if isinstance(attribute, basestring) else unicode(attribute))
+
+    for child_key, child_value in children:
+        for child in _as_values(child_value):
+            _build_element(element, child_key, child, scope)
+
+    if text is not None:
+        # As with xmltodict.unparse, text follows any child elements
+        _append_text(element, text if isinstance(text, basestring) else unicode(text), scope)
+
+    return element
+
+
+def _append_text(element, text, scope):
+    container = _parse_embedded_xml(text, scope.get(None))
+    if container is not None:
+        _add_text(element, container.text)
+        for node in container:
+            element.append(node)
+    else:
+        _add_text(element, text)
+
+
+def _add_text(element, text):
+    if not text:
+        return
+    if len(element):
+        last = element[-1]
+        last.tail = (last.tail or "") + text
+    else:
+        element.text = (element.text or "") + text
+
+
+# Whether a text value is embedded XML is remembered for the most recent values, so that values that recur across events
+# (such as the same escaped HTML snippet) are only parsed once. Longer values are not remembered, to bound the memory held
+_embedded_xml_verdicts = LRUCache(maxsize=1024)
+_EMBEDDED_XML_MEMO_LENGTH = 4096
+
+
+def is_embedded_xml(text):
+    """Returns whether text is a single well formed XML element that is inserted as nodes rather than escaped on conversion"""
+    if len(text) <= _EMBEDDED_XML_MEMO_LENGTH and not isinstance(text, EscapedText):
+        verdict = _embedded_xml_verdicts.get(text)
+        if verdict is not None:
+            return verdict
+    return _parse_embedded_xml(text, None) is not None
+
+
+def _parse_embedded_xml(text, default_namespace):
+    """
+    Parses text that is an XML document of its own into a container element, so that its nodes can be inserted in place
+    of the text. Returns None if the text is not a single well formed XML element (optionally surrounded by whitespace,
+    comments and processing instructions), or is an EscapedText
+    """
+    if isinstance(text, EscapedText):
+        return None
+
+    # Cheap checks first: most text does not look like markup at all, and markup followed or preceded by text is not embedded
+    stripped = text.strip()
+    if not stripped or stripped[0] != "<" or stripped[-1] != ">":
+        return None
+
+    memoize = len(text) <= _EMBEDDED_XML_MEMO_LENGTH
+    if memoize and _embedded_xml_verdicts.get(text) is False:
+        return None
+
+    container = _parse_embedded_container(text, default_namespace)
+    if memoize:
+        _embedded_xml_verdicts[text] = container is not None
+    return container
+
+
+def _parse_embedded_container(text, default_namespace):
+    if default_namespace:
+        wrapped = "<embedded xmlns=%s>%s</embedded>" % (quoteattr(default_namespace), text)
+    else:
+        wrapped = "<embedded>%s</embedded>" % text
+
+    try:
+        container = etree.fromstring(wrapped)
+    except (etree.XMLSyntaxError, ValueError):
+        return None
+
+    elements = 0
+    for node in container:
+        if isinstance(node.tag, basestring):
+            elements += 1
+        if node.tail and node.tail.strip():
+            return None
+    if elements != 1 or (container.text and container.text.strip()):
+        return None
+    return container
+
+
 class _JSONFormatInterface(DataFormatInterface):
 
+    __slots__ = ()
+
     content_type = "application/json"
 
-    conversion_methods = {str: lambda data: json.loads(data)}
-    conversion_methods.update(dict.fromkeys(_JSON_TYPES, lambda data: json.loads(json.dumps(data, default=decimal_default))))
-    conversion_methods.update(dict.fromkeys(_XML_TYPES, lambda data: remove_internal_xmlify(xmltodict.parse(etree.tostring(data), expat=expat, force_list=should_force_list))))
+    conversion_methods = {str: lambda data: _json_codec.loads(data)}
+    conversion_methods.update(dict.fromkeys(_JSON_TYPES, _json_data))
+    conversion_methods.update(dict.fromkeys(_XML_TYPES, lambda data: remove_internal_xmlify(etree_to_dict(data, force_list=should_force_list))))
     conversion_methods.update({None.__class__: lambda data: {}})
 
-    def __getstate__(self):
-        state = super(_JSONFormatInterface, self).__getstate__()
-        state['_data'] = json.dumps(self.data)
-        return state
+    @classmethod
+    def _serialize_data(cls, data):
+        return _json_codec.dumps(data)
 
     def data_string(self):
-        return json.dumps(self.data, default=decimal_default)
+        if self._data.__class__ is RawData:
+            return self._data.raw
+        return _json_codec.dumps(self.data)
 
     def error_string(self):
         error = self.format_error()
         if error:
             try:
-                error = json.dumps(error)
+                error = _json_codec.dumps(error)
             except Exception:
                 pass
         return error
 
 
 class XMLEvent(_XMLFormatInterface, Event):
-    pass
+    __slots__ = ()
 
 
 class JSONEvent(_JSONFormatInterface, Event):
-    pass
+    __slots__ = ()
 
 
 class JSONHttpEvent(JSONEvent, HttpEvent):
-    pass
+    __slots__ = ()
 
 
 class XMLHttpEvent(XMLEvent, HttpEvent):
-    pass
+    __slots__ = ()
 
 
 class LogEvent(Event):
@@ -458,9 +1191,12 @@ class LogEvent(Event):
     This is a lightweight event designed to mimic some of the event properties of a regular event
     """
 
+    __slots__ = ("id", "level", "time", "origin_actor", "message", "sensitive")
+    _properties = Event._properties + __slots__
+
     def __init__(self, level, origin_actor, message, id=None, sensitive=False):
         self.id = id
-        self.event_id = uuid().get_hex()
+        self.event_id = generate_id()
         self.meta_id = id or self.event_id
         self.level = level
         self.time = datetime.now().strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
@@ -473,7 +1209,59 @@ class LogEvent(Event):
                     "origin_actor":     self.origin_actor,
                     "message":          self.message}
 
+_classes_by_bases = {}
+_conversion_plans = {}
+
+
+def register_event_class(cls):
+    """
+    Registers an event class as the result of converting an event to one of its bases. For example, converting an
+    HttpEvent to an XMLEvent results in XMLHttpEvent, as it is registered with the bases (XMLEvent, HttpEvent).
+    Custom event classes that combine other event classes should be registered the same way. Usable as a class decorator
+    """
+    _classes_by_bases[cls.__bases__] = cls
+    _conversion_plans.clear()
+    return cls
+
+
+def _resolve_conversion(source, convert_to):
+    if issubclass(convert_to, source):
+        # Widening conversion
+        return convert_to
+
+    if issubclass(source, convert_to):
+        # This is an attempted narrowing conversion
+        raise InvalidEventConversion("Narrowing event conversion attempted, this is not allowed <Attempted {old} -> {new}>".format(
+                old=source, new=convert_to))
+
+    # A complex widening conversion
+    bases = tuple([convert_to] + filter(lambda cls: not issubclass(cls, DataFormatInterface) and not issubclass(convert_to, cls), list(source.__bases__) + [source]))
+    if len(bases) == 1:
+        return bases[0]
+
+    try:
+        return _classes_by_bases[bases]
+    except KeyError:
+        raise InvalidEventConversion("No registered event class combines {bases} <Attempted {old} -> {new}>".format(
+                bases=bases, old=source, new=convert_to))
+
+
+def get_conversion_plan(source, convert_to):
+    """
+    Returns a tuple of the class an event of class 'source' becomes when converted to 'convert_to', and whether both
+    classes share the same data format (in which case the data is carried over without conversion). Plans are memoized
+    """
+    try:
+        return _conversion_plans[(source, convert_to)]
+    except KeyError:
+        new_class = _resolve_conversion(source, convert_to)
+        plan = _conversion_plans[(source, convert_to)] = (new_class, new_class.conversion_methods is source.conversion_methods)
+        return plan
+
+
 built_classes = [Event, XMLEvent, JSONEvent, HttpEvent, JSONHttpEvent, XMLHttpEvent, LogEvent]
+for cls in built_classes:
+    register_event_class(cls)
 __all__ = map(lambda cls: cls.__name__, built_classes)
 
 http_code_map = defaultdict(lambda: {"status": ((500, "Internal Server Error"))},
@@ -63,7 +63,7 @@ class Logger(object):
                 log_event = LogEvent(level, self.name, message, id=log_entry_id, sensitive=sensitive)
                 self.__pool[key].put(log_event)
             except QueueFull:
-                self.__pool.wait_until_free()
+                self.__pool[key].wait_until_free()
                 self.__pool[key].put(log_event)
 
     def critical(self, message, event=None, log_entry_id=None, sensitive=False):
@@ -104,5 +104,5 @@ class Logger(object):
             try:
                 self.__pool[key].put(new_event)
             except QueueFull:
-                self.__pool.wait_until_free()
+                self.__pool[key].wait_until_free()
                 self.__pool[key].put(new_event)
\ No newline at end of file
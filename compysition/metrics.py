@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  metrics.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+from collections import deque
+from time import time
+
+
+class Histogram(object):
+    """
+    **A log-linear histogram of durations, in the style of HdrHistogram**
+
+    Durations are counted in microsecond buckets. Every power of 2 range of microseconds is split into 2 ** precision linear
+    buckets, so that a percentile is reported within a relative error of 1 / 2 ** precision whatever its magnitude, while
+    only the buckets that were hit take up memory. Recorded durations are buffered, and counted in bulk once buffer_size
+    of them are waiting or a snapshot is taken. Hot paths may append to 'buffer' directly, as long as they flush it once it
+    reaches buffer_size
+
+    Parameters:
+        precision (Optional[int]):
+            | The amount of bits of each duration that are kept
+            | (Default: 4)
+        buffer_size (Optional[int]):
+            | The max amount of durations waiting to be counted
+            | (Default: 256)
+    """
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self, precision=4, buffer_size=256):
+        self.precision = precision
+        self.buffer_size = buffer_size
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buffer = []
+        self.__linear = 1 << precision
+
+    def record(self, duration):
+        """Records a duration (in seconds)"""
+        buffer = self.buffer
+        buffer.append(duration)
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Counts the buffered durations"""
+        durations = self.buffer[:]
+        if not durations:
+            return
+        del self.buffer[:]
+
+        counts, linear, precision = self.counts, self.__linear, self.precision
+        for duration in durations:
+            value = int(duration * 1000000)
+            if value < linear:
+                index = value if value > 0 else 0
+            else:
+                shift = value.bit_length() - 1 - precision
+                index = (shift << precision) + (value >> shift)
+            counts[index] = counts.get(index, 0) + 1
+
+        self.count += len(durations)
+        self.total += sum(durations)
+        self.min = min(durations) if self.min is None else min(self.min, min(durations))
+        self.max = max(durations) if self.max is None else max(self.max, max(durations))
+
+    def bucket_bounds(self, index):
+        """Returns the range of microseconds [lower, upper) that are counted in the bucket at index"""
+        if index < self.__linear:
+            return index, index + 1
+        shift = (index >> self.precision) - 1
+        value = index - (shift << self.precision)
+        return value << shift, (value + 1) << shift
+
+    def percentile(self, percentile):
+        """Returns the duration (in seconds) that percentile percent of the recorded durations do not exceed"""
+        self.flush()
+        if not self.count:
+            return None
+
+        threshold = self.count * percentile / 100.0
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                break
+
+        lower, upper = self.bucket_bounds(index)
+        return min(max((lower + upper) / 2000000.0, self.min), self.max)
+
+    def snapshot(self):
+        self.flush()
+        snapshot = {"count": self.count,
+                    "min": self.min,
+                    "max": self.max,
+                    "mean": self.total / self.count if self.count else None}
+        for percentile in self.PERCENTILES:
+            snapshot["p{0}".format(percentile).replace(".", "_")] = self.percentile(percentile)
+        return snapshot
+
+
+class RateCounter(object):
+    """
+    **Counts occurrences, and their rate per second over the last window seconds**
+
+    Rather than counting every occurrence per second, the running total is noted once per second that has occurrences,
+    so that counting an occurrence is a single comparison and addition
+
+    Parameters:
+        window (Optional[int]):
+            | The amount of (complete) seconds the rate is averaged over
+            | (Default: 10)
+    """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.total = 0
+        self.__next_second = 0
+        # The total counted before each of the last (window + 1) seconds that have occurrences, as (second, total)
+        self.__totals = deque(maxlen=window + 1)
+
+    def add(self, amount=1, now=None):
+        if now is None:
+            now = time()
+        if now >= self.__next_second:
+            second = int(now)
+            self.__totals.append((second, self.total))
+            self.__next_second = second + 1
+        self.total += amount
+
+    def __total_before(self, second):
+        for noted_second, total in self.__totals:
+            if noted_second >= second:
+                return total
+        return self.total
+
+    def rate(self, now=None):
+        """Returns the average amount of occurrences per second over the last window seconds, excluding the current second"""
+        current = int(now if now is not None else time())
+        return (self.__total_before(current) - self.__total_before(current - self.window)) / float(self.window)
+
+
+class ActorMetrics(object):
+    """
+    **The runtime metrics of an Actor (See Actor.metrics)**
+
+    Counts the events consumed and sent by the actor, the errors and rescues of its 'consume' executions and the time they take
+    """
+
+    def __init__(self):
+        self.events_in = RateCounter()
+        self.events_out = RateCounter()
+        self.errors = 0
+        self.rescues = 0
+        self.consume_time = Histogram()
+        self.__consume_times = self.consume_time.buffer
+
+    def consumed(self, amount, started):
+        """Records a 'consume' execution of amount events, that started at started (See time.time)"""
+        now = time()
+        self.events_in.add(amount, now)
+        consume_times = self.__consume_times
+        consume_times.append(now - started)
+        if len(consume_times) >= self.consume_time.buffer_size:
+            self.consume_time.flush()
+
+    def snapshot(self, now=None):
+        now = now if now is not None else time()
+        return {"events_in": self.events_in.total,
+                "events_in_per_second": self.events_in.rate(now=now),
+                "events_out": self.events_out.total,
+                "events_out_per_second": self.events_out.rate(now=now),
+                "errors": self.errors,
+                "rescues": self.rescues,
+                "consume_time": self.consume_time.snapshot()}
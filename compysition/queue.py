@@ -23,12 +23,14 @@
 #
 import gevent.queue as gqueue
 
+from collections import deque
+from time import time
 from uuid import uuid4 as uuid
-from gevent import sleep
 from gevent.hub import LoopExit
 from gevent.event import Event
 
 from compysition.errors import QueueEmpty, QueueFull
+from compysition.metrics import Histogram
 
 class _InternalQueuePool(dict):
     """
@@ -95,13 +97,55 @@ class Queue(gqueue.Queue):
         name (str):
             | The name of this queue. Used in certain actors to determine origin faster than reverse key-value lookup
 
+    The time each item waits on the queue is recorded in 'wait_time' (See metrics)
+
     '''
 
     def __init__(self, name, *args, **kwargs):
+        self.__is_empty = Event()
+        self.__has_space = Event()
+        self.__put_times = deque()
+        self.wait_time = Histogram()
+        self.__wait_times = self.wait_time.buffer
         super(Queue, self).__init__(*args, **kwargs)
         self.name = name
         self.__has_content = Event()
         self.__has_content.clear()
+        self.__update_waiters()
+
+    def _put(self, item):
+        super(Queue, self)._put(item)
+        self.__put_times.append(time())
+        self.__update_waiters()
+
+    def _get(self):
+        item = super(Queue, self)._get()
+        if self.__put_times:
+            wait_times = self.__wait_times
+            wait_times.append(time() - self.__put_times.popleft())
+            if len(wait_times) >= self.wait_time.buffer_size:
+                self.wait_time.flush()
+        self.__update_waiters()
+        return item
+
+    def metrics(self):
+        """Returns a snapshot of the current depth of this queue and of the time items waited on it"""
+        return {"depth": self.qsize(),
+                "maxsize": self.maxsize,
+                "wait_time": self.wait_time.snapshot()}
+
+    def __update_waiters(self):
+        """Sets or clears the events that wait_until_empty and wait_until_free block on. Called on every insertion and removal"""
+        size = self.qsize()
+        if size == 0:
+            self.__is_empty.set()
+        else:
+            self.__is_empty.clear()
+
+        if not self.maxsize or size < self.maxsize:
+            self.__has_space.set()
+        else:
+            self.__has_space.clear()
 
     def get(self, block=False, *args, **kwargs):
         '''Gets an element from the queue.'''
@@ -132,15 +176,11 @@ class Queue(gqueue.Queue):
 
     def wait_until_empty(self):
         '''Blocks until the queue is completely empty.'''
-
-        while not self.__has_content.is_set():
-            sleep(0)
+        self.__is_empty.wait()
 
     def wait_until_free(self):
         '''Blocks until the queue has at lease 1 free slot.'''
-
-        while self.qsize() >= self.maxsize:
-            sleep(0)
+        self.__has_space.wait()
             
     def dump(self, other_queue):
         """**Dump all items on this queue to another queue**"""
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  rescue.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+import heapq
+import random
+
+from itertools import count
+from time import time
+from gevent import spawn
+from gevent.event import Event
+
+from compysition.errors import QueueFull
+
+
+class RescueScheduler(object):
+    """
+    **Holds rescued events in a timer heap until their retry is due, then puts them back on their origin queue**
+
+    A single greenlet drains the heap, and only while it holds events. Waiting events do not park a consumer greenlet,
+    so healthy events keep flowing through the actor while failed events back off.
+
+    Parameters:
+        delay (Optional[float]):
+            | The time (in seconds) to wait before the first retry of an event
+            | (Default: 1)
+        backoff (Optional[float]):
+            | The factor the delay is multiplied by on every following retry of the same event
+            | (Default: 2)
+        max_delay (Optional[float]):
+            | The upper bound of the delay between two retries of an event
+            | (Default: 60)
+        jitter (Optional[float]):
+            | The fraction (0 to 1) of each delay that is randomized, so that events failing together do not retry in lockstep.
+            | A retry is due somewhere between delay * (1 - jitter) and delay
+            | (Default: 0.5)
+        budget (Optional[int]):
+            | The max amount of events that may be waiting for a retry at once. Events beyond the budget are refused.
+            | A value of 0 represents no limit
+            | (Default: 0)
+        pool (Optional[gevent.pool.Pool]):
+            | The pool the draining greenlet is spawned in. If not provided, gevent.spawn is used
+            | (Default: None)
+    """
+
+    def __init__(self, delay=1, backoff=2, max_delay=60, jitter=0.5, budget=0, pool=None):
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget = budget
+        self.__spawn = pool.spawn if pool is not None else spawn
+        self.__heap = []
+        self.__sequence = count()
+        self.__wakeup = Event()
+        self.__greenlet = None
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def get_delay(self, attempt):
+        """Returns the time (in seconds) to wait before the given (1 based) retry attempt"""
+        delay = min(self.max_delay, self.delay * self.backoff ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    def schedule(self, event, queue, attempt=1):
+        """
+        Schedules event to be put back on queue once the delay for the given retry attempt has passed.
+        Returns False, without scheduling the event, if the retry budget is exhausted
+        """
+        if self.budget and len(self.__heap) >= self.budget:
+            return False
+
+        self.__push(time() + self.get_delay(attempt), event, queue)
+        return True
+
+    def __push(self, due, event, queue):
+        heapq.heappush(self.__heap, (due, next(self.__sequence), event, queue))
+        if self.__greenlet is None:
+            self.__greenlet = self.__spawn(self.__run)
+        elif self.__heap[0][2] is event:
+            # The new event is due before the one the greenlet is currently waiting on
+            self.__wakeup.set()
+
+    def __run(self):
+        try:
+            while self.__heap:
+                self.__wakeup.clear()
+                self.__wakeup.wait(timeout=max(0, self.__heap[0][0] - time()))
+                now = time()
+                while self.__heap and self.__heap[0][0] <= now:
+                    due, sequence, event, queue = heapq.heappop(self.__heap)
+                    try:
+                        queue.put(event, block=False)
+                    except QueueFull:
+                        self.__push(now + self.delay, event, queue)
+                        break
+        finally:
+            self.__greenlet = None
@@ -0,0 +1,92 @@
+import unittest
+import gevent
+
+from lxml import etree
+
+from compysition.actors.batch import BatchAggregator, XMLBatchAggregator, BatchSplitter, XMLBatchSplitter
+from compysition.errors import QueueEmpty, MalformedEventData
+from compysition.event import JSONEvent, XMLEvent
+from compysition.testutils.test_actor import TestActorWrapper
+
+
+class TestBatchAggregator(unittest.TestCase):
+
+    def generate_actor(self, **kwargs):
+        return TestActorWrapper(BatchAggregator("batchtest", **kwargs), output_timeout=.5)
+
+    def put(self, actor, *records):
+        for record in records:
+            actor.input_queues['inbox'].put(JSONEvent(data=record))
+
+    def test_max_events(self):
+        actor = self.generate_actor(max_events=2, max_wait=0)
+        self.put(actor, {"one": 1}, {"two": 2}, {"three": 3})
+        self.assertEqual(actor.output.data, [{"one": 1}, {"two": 2}])
+        with self.assertRaises(QueueEmpty):
+            actor.output
+
+    def test_max_bytes(self):
+        actor = self.generate_actor(max_events=0, max_bytes=20, max_wait=0)
+        self.put(actor, {"one": 1}, {"two": 2}, {"three": 3})
+        self.assertEqual(actor.output.data, [{"one": 1}, {"two": 2}])
+
+    def test_max_wait(self):
+        actor = self.generate_actor(max_events=10, max_wait=.1)
+        self.put(actor, {"one": 1})
+        gevent.sleep(.05)
+        self.put(actor, {"two": 2})
+        self.assertEqual(actor.output.data, [{"one": 1}, {"two": 2}])
+
+        # The next batch starts its own window
+        self.put(actor, {"three": 3})
+        self.assertEqual(actor.output.data, [{"three": 3}])
+
+    def test_flush_on_stop(self):
+        actor = self.generate_actor(max_events=10, max_wait=0)
+        self.put(actor, {"one": 1})
+        gevent.sleep(.1)
+        actor.stop()
+        self.assertEqual(actor.output.data, [{"one": 1}])
+
+    def test_no_window(self):
+        with self.assertRaises(ValueError):
+            BatchAggregator("batchtest", max_events=0, max_wait=0)
+
+    def test_xml(self):
+        actor = TestActorWrapper(XMLBatchAggregator("batchtest", max_events=2), output_timeout=.5)
+        for record in ("<one/>", "<two/>"):
+            actor.input_queues['inbox'].put(XMLEvent(data=record))
+        self.assertEqual(actor.output.data_string(), "<batchtest><one/><two/></batchtest>")
+
+
+class TestBatchSplitter(unittest.TestCase):
+
+    def test_split(self):
+        actor = TestActorWrapper(BatchSplitter("splittest"), output_timeout=.5)
+        actor.input = JSONEvent(meta_id="batch", data=[{"one": 1}, {"two": 2}])
+        outputs = [actor.output, actor.output]
+        self.assertEqual([output.data for output in outputs], [{"one": 1}, {"two": 2}])
+        self.assertEqual([output.meta_id for output in outputs], ["batch", "batch"])
+        self.assertNotEqual(outputs[0].event_id, outputs[1].event_id)
+
+    def test_split_not_a_batch(self):
+        actor = TestActorWrapper(BatchSplitter("splittest"), output_timeout=.5)
+        actor.input = JSONEvent(data={"one": 1})
+        self.assertIsInstance(actor.error.error, MalformedEventData)
+
+    def test_xml_round_trip(self):
+        aggregator = TestActorWrapper(XMLBatchAggregator("batchtest", max_events=2), output_timeout=.5)
+        for record in ("<one>1</one>", "<two>2</two>"):
+            aggregator.input_queues['inbox'].put(XMLEvent(data=record))
+
+        splitter = TestActorWrapper(XMLBatchSplitter("splittest"), output_timeout=.5)
+        splitter.input = aggregator.output
+        self.assertEqual([splitter.output.data_string() for _ in range(2)], ["<one>1</one>", "<two>2</two>"])
+
+    def test_xml_split_detached(self):
+        actor = TestActorWrapper(XMLBatchSplitter("splittest"), output_timeout=.5)
+        actor.input = XMLEvent(data="<batch><!-- records --><one>1</one> <?skip?><two>2</two></batch>")
+        outputs = [actor.output, actor.output]
+        self.assertEqual([output.data_string() for output in outputs], ["<one>1</one>", "<two>2</two>"])
+        self.assertEqual([len(output.data.xpath("/*")) for output in outputs], [1, 1])
+        self.assertEqual(outputs[1].data.xpath("/*")[0].tag, "two")
@@ -1,6 +1,8 @@
 import unittest
 
+from compysition import event
 from compysition.actors.dicttoxml import DictToXML, PropertiesToXML
+from compysition.actors.xml_to_dict import XMLToDict
 from compysition.event import JSONEvent, XMLEvent, XMLHttpEvent, HttpEvent
 from compysition.testutils.test_actor import TestActorWrapper
 
@@ -31,6 +33,20 @@ class TestDictToXML(unittest.TestCase):
         output = self.actor.output
         self.assertEqual(output.data_string(), "<dicttoxml><foo><foo><bar>barvalue</bar></foo></foo><fubar>barfu</fubar></dicttoxml>")
 
+    def test_escaped_xml_dict_conversion(self):
+        self.actor = TestActorWrapper(DictToXML("dicttoxml", escape_xml=True))
+        _input = JSONEvent(data={"foo": "<foo><bar>barvalue</bar></foo>", "fubar": "barfu"})
+        self.actor.input = _input
+        output = self.actor.output
+        self.assertEqual(output.data_string(), "<dicttoxml><foo>&lt;foo&gt;&lt;bar&gt;barvalue&lt;/bar&gt;&lt;/foo&gt;</foo><fubar>barfu</fubar></dicttoxml>")
+
+    def test_escaped_xml_keys_dict_conversion(self):
+        self.actor = TestActorWrapper(DictToXML("dicttoxml", escape_xml=["foo"]))
+        _input = JSONEvent(data={"root": {"foo": {"bar": "<b>bold</b>"}, "fubar": "<b>bold</b>"}})
+        self.actor.input = _input
+        output = self.actor.output
+        self.assertEqual(output.data_string(), "<root><foo><bar>&lt;b&gt;bold&lt;/b&gt;</bar></foo><fubar><b>bold</b></fubar></root>")
+
     def test_json_event_class_conversion(self):
         _input = JSONEvent(data={"foo": "bar"})
         self.actor.input = _input
@@ -62,6 +78,27 @@ class TestDictToXML(unittest.TestCase):
         output = self.actor.output
         self.assertEqual(output.data_string(), '<jsonified_envelope><errors><foo>bar</foo></errors><errors><foo>bar</foo></errors><errors><foo>bar</foo></errors></jsonified_envelope>')
 
+    def test_xml_round_trip_conversion(self):
+        conversions = []
+        dict_to_etree = event.dict_to_etree
+
+        def counting_dict_to_etree(data):
+            conversions.append(data)
+            return dict_to_etree(data)
+
+        event.dict_to_etree = counting_dict_to_etree
+        try:
+            xml_to_dict = TestActorWrapper(XMLToDict("xmltodict"))
+            xml_to_dict.input = XMLEvent(data="<root><foo>bar</foo><fubar>barfu</fubar></root>")
+            self.actor.input = xml_to_dict.output
+            output = self.actor.output
+        finally:
+            event.dict_to_etree = dict_to_etree
+
+        self.assertEqual(output.data_string(), "<root><foo>bar</foo><fubar>barfu</fubar></root>")
+        # The XML the dict was converted from is used again, rather than being rebuilt from the dict
+        self.assertEqual(conversions, [])
+
 
 class TestPropertiesToXML(unittest.TestCase):
 
@@ -1,7 +1,9 @@
 import unittest
 
 from compysition.actors import EventAttributeModifier, JSONEventAttributeDelete, EventAttributeDelete, EventAttributeRegexSubstitution
-from compysition.event import JSONEvent, Event
+from compysition.actors.eventattributemodifier import (XMLEventAttributeModifier, JSONEventAttributeModifier, KeyChainSetter,
+                                                       XMLKeyChainSetter)
+from compysition.event import JSONEvent, Event, XMLEvent
 from compysition.testutils.test_actor import TestActorWrapper
 
 class TestEventAttributeModifier(unittest.TestCase):
@@ -26,6 +28,77 @@ class TestEventAttributeModifier(unittest.TestCase):
         event = actor1.get_key_chain_value(event, 'new value')
         ##TODO Continue
 
+    def test_get_nested_key_chain_value(self):
+        actor = EventAttributeModifier(name='actor', key='data/foo/bar')
+        event = actor.get_key_chain_value(JSONEvent(data={'foo': {'baz': 1}}), 'new value')
+        self.assertEqual(event.data, {'foo': {'baz': 1, 'bar': 'new value'}})
+        event = actor.get_key_chain_value(JSONEvent(), 'new value')
+        self.assertEqual(event.data, {'foo': {'bar': 'new value'}})
+
+    def test_get_key_chain_value_non_dict(self):
+        actor = EventAttributeModifier(name='actor', key='data/foo/bar')
+        with self.assertRaises(TypeError):
+            actor.get_key_chain_value(JSONEvent(data={'foo': ['baz']}), 'new value')
+
+
+class TestKeyChainSetter(unittest.TestCase):
+
+    def test_flat_path(self):
+        setter = KeyChainSetter(('data', 'foo'))
+        self.assertEqual(setter.set, setter._set_flat)
+        self.assertEqual(setter(JSONEvent(data={'bar': 1}), 'new value').data, {'bar': 1, 'foo': 'new value'})
+        self.assertEqual(setter(JSONEvent(), 'new value').data, {'foo': 'new value'})
+
+    def test_nested_path(self):
+        setter = KeyChainSetter(('data', 'foo', 'bar'))
+        self.assertEqual(setter.set, setter._set_nested)
+        self.assertEqual(setter(JSONEvent(data={'foo': {'baz': 1}}), 'new value').data, {'foo': {'baz': 1, 'bar': 'new value'}})
+
+    def test_attribute(self):
+        setter = KeyChainSetter(('meta_id', ))
+        self.assertEqual(setter(Event(), 'new value').meta_id, 'new value')
+
+    def test_xml_plain_steps(self):
+        setter = XMLKeyChainSetter(('data', 'root', 'foo', 'bar'))
+        self.assertEqual(setter.steps, (('foo', True), ('bar', True)))
+        event = setter(XMLEvent(data='<root><!-- foo --><baz/><foo/><foo><bar>old</bar></foo></root>'), 'new value')
+        self.assertEqual(event.data_string(), '<root><!-- foo --><baz/><foo><bar>new value</bar></foo><foo><bar>old</bar></foo></root>')
+
+    def test_xml_path_steps(self):
+        setter = XMLKeyChainSetter(('data', 'root', "foo[@id='2']", 'bar'))
+        self.assertEqual(setter.steps, (("foo[@id='2']", False), ('bar', True)))
+        event = setter(XMLEvent(data='<root><foo id="1"/><foo id="2"><bar>old</bar></foo></root>'), 'new value')
+        self.assertEqual(event.data_string(), '<root><foo id="1"/><foo id="2"><bar>new value</bar></foo></root>')
+
+
+class TestXMLEventAttributeModifier(unittest.TestCase):
+
+    def test_get_key_chain_value(self):
+        actor = XMLEventAttributeModifier(name='actor', key='data/root/foo/bar')
+        event = actor.get_key_chain_value(XMLEvent(data='<root><foo><bar>old</bar></foo></root>'), 'new value')
+        self.assertEqual(event.data_string(), '<root><foo><bar>new value</bar></foo></root>')
+        event = actor.get_key_chain_value(XMLEvent(data='<root><baz/></root>'), 'new value')
+        self.assertEqual(event.data_string(), '<root><baz/><foo><bar>new value</bar></foo></root>')
+
+    def test_get_key_chain_value_first_element(self):
+        actor = XMLEventAttributeModifier(name='actor', key='data/root/foo/bar')
+        event = actor.get_key_chain_value(XMLEvent(data='<root><foo/><foo><bar>old</bar></foo></root>'), 'new value')
+        self.assertEqual(event.data_string(), '<root><foo><bar>new value</bar></foo><foo><bar>old</bar></foo></root>')
+
+    def test_get_key_chain_value_root_mismatch(self):
+        actor = XMLEventAttributeModifier(name='actor', key='data/other/foo')
+        with self.assertRaises(Exception):
+            actor.get_key_chain_value(XMLEvent(data='<root/>'), 'new value')
+
+
+class TestJSONEventAttributeModifier(unittest.TestCase):
+
+    def test_get_modify_value(self):
+        actor = JSONEventAttributeModifier(name='actor', key='status', value='foo/bar')
+        self.assertEqual(actor.get_modify_value(JSONEvent(data={'foo': {'bar': 'value'}})), 'value')
+        self.assertEqual(actor.get_modify_value(JSONEvent(data=[{'foo': {'bar': 'value'}}, {'foo': {}}])), 'value')
+        self.assertIsNone(actor.get_modify_value(JSONEvent(data={'foo': {}})))
+
 class TestJSONEventAttributeDelete(unittest.TestCase):
 
     def test_single_event_attribute(self):
@@ -1,8 +1,11 @@
 import json
 import unittest
+import gevent
+
+from copy import deepcopy
 
 from compysition.actors.eventjoin import EventJoin, XMLEventJoin, JSONEventJoin
-from compysition.errors import QueueEmpty
+from compysition.errors import QueueEmpty, EventRateExceeded, EventAttributeError
 from compysition.testutils.test_actor import TestActorWrapper
 
 class TestEventJoin(unittest.TestCase):
@@ -53,3 +56,76 @@ class TestJSONEventJoin(TestEventJoin):
     input_data = {"foo": "bar"}
     output_data = json.dumps(input_data)
     actor_class = JSONEventJoin
+
+
+class TestEventJoinExpiry(unittest.TestCase):
+
+    def generate_actor(self, **kwargs):
+        return TestActorWrapper(JSONEventJoin("eventjointest", **kwargs), input_queues=["one", "two"], output_timeout=.5)
+
+    def test_purge_interval_drops(self):
+        actor = self.generate_actor(purge_interval=.1)
+        actor.input_queues['one'].put(JSONEventJoin.input(data={"one": 1}))
+        gevent.sleep(.3)
+        self.assertEqual(actor.actor.events, {})
+        with self.assertRaises(QueueEmpty):
+            actor.output
+
+    def test_purge_interval_partial(self):
+        actor = self.generate_actor(purge_interval=.1, expire_policy="partial")
+        actor.input_queues['one'].put(JSONEventJoin.input(data={"one": 1}))
+        self.assertEqual(actor.output.data, {"one": 1})
+        self.assertEqual(actor.actor.events, {})
+
+    def test_max_pending_error(self):
+        actor = self.generate_actor(max_pending=2, expire_policy="error")
+        events = [JSONEventJoin.input(data={"index": index}) for index in range(3)]
+        for event in events:
+            actor.input_queues['one'].put(event)
+        error = actor.error
+        self.assertEqual(error.event_id, events[0].event_id)
+        self.assertIsInstance(error.error, EventRateExceeded)
+        gevent.sleep(.1)
+        self.assertEqual(sorted(actor.actor.events), sorted(event.event_id for event in events[1:]))
+
+        # The remaining joins still complete
+        event = deepcopy(events[2])
+        event.data = {"two": 2}
+        actor.input_queues['two'].put(event)
+        self.assertEqual(actor.output.data, {"index": 2, "two": 2})
+
+    def test_invalid_expire_policy(self):
+        with self.assertRaises(ValueError):
+            EventJoin("eventjointest", expire_policy="ignore")
+
+    def test_purge_interval_partial_marks_missing(self):
+        actor = self.generate_actor(purge_interval=.1, expire_policy="partial")
+        actor.input_queues['two'].put(JSONEventJoin.input(data={"two": 2}))
+        self.assertEqual(actor.output.get("eventjointest_missing_inboxes"), ["one"])
+
+
+class TestEventJoinCorrelation(unittest.TestCase):
+
+    def generate_actor(self, **kwargs):
+        return TestActorWrapper(JSONEventJoin("eventjointest", **kwargs), input_queues=["one", "two"], output_timeout=.5)
+
+    def test_correlation_key(self):
+        actor = self.generate_actor(correlation_key=("data", "order"))
+        actor.input_queues['one'].put(JSONEventJoin.input(data={"order": 1, "one": 1}))
+        actor.input_queues['one'].put(JSONEventJoin.input(data={"order": 2, "one": 2}))
+        actor.input_queues['two'].put(JSONEventJoin.input(data={"order": 2, "two": 2}))
+        self.assertEqual(actor.output.data, {"order": 2, "one": 2, "two": 2})
+        self.assertEqual(list(actor.actor.events), [1])
+
+    def test_missing_correlation_key(self):
+        actor = self.generate_actor(correlation_key="correlation_id")
+        actor.input_queues['one'].put(JSONEventJoin.input(data={"one": 1}))
+        self.assertIsInstance(actor.error.error, EventAttributeError)
+
+    def test_timeout_key(self):
+        actor = self.generate_actor(correlation_key="meta_id", timeout_key="join_timeout", purge_interval=60,
+                                    expire_policy="partial")
+        actor.input_queues['one'].put(JSONEventJoin.input(meta_id="request", data={"one": 1}, join_timeout=.1))
+        output = actor.output
+        self.assertEqual(output.data, {"one": 1})
+        self.assertEqual(output.eventjointest_missing_inboxes, ["two"])
@@ -1,8 +1,12 @@
 import unittest
 
-from compysition.actors import EventFilter, EventRouter, EventXMLFilter, EventXMLXpathsFilter
+from lxml import etree
+
+from compysition.actors import (EventFilter, EventRouter, EventXMLFilter, EventXMLXpathsFilter, EventExactFilter, EventPrefixFilter,
+                                SimpleRouter)
 from compysition.errors import QueueEmpty
-from compysition.event import Event, XMLEvent
+from compysition.actors.eventrouter import ScopeAccessor, FilterEngine
+from compysition.event import Event, XMLEvent, JSONEvent, get_path_accessor
 from compysition.testutils.test_actor import TestActorWrapper
 
 class TestEventRouter(unittest.TestCase):
@@ -121,3 +125,138 @@ class TestEventXMLXpathsFilter(TestEventRouter):
                         "outbox_names": ["four"]}
 
     cases = [single_outbox_case, multiple_outbox_case, regex_match_case]
+
+
+class TestEventXMLXpathsFilterRegexes(unittest.TestCase):
+
+    def test_regexes_are_not_shared(self):
+        filter = EventXMLXpathsFilter(regex_xpath="//regex", xpath="//value")
+        matching = XMLEvent(data="<root><value>one</value><regex>^o</regex></root>")
+        mismatching = XMLEvent(data="<root><value>two</value><regex>^o</regex></root>")
+        for _ in range(2):
+            self.assertTrue(filter.matches(matching))
+            self.assertFalse(filter.matches(mismatching))
+        self.assertEqual(filter.value_regexes, [])
+
+    def test_compiled_regexes_are_reused(self):
+        filter = EventXMLXpathsFilter(regex_xpath="//regex", xpath="//value")
+        first, second = [filter.parse_value_regexes([etree.XML("<regex>a+</regex>").xpath("//regex/text()")[0]])[0]
+                         for _ in range(2)]
+        self.assertIs(first, second)
+        self.assertIs(type(EventXMLXpathsFilter.compiled_regexes.get("a+").pattern), str)
+
+
+class TestEventFilterScope(unittest.TestCase):
+
+    def test_scope_lookup(self):
+        event = JSONEvent(data={"a": {"b": [{"c": "value"}]}}, custom=("first", "second"))
+        cases = [(("data", "a", "b", 0, "c"), "value"),
+                 (("data", "a", "b", -1, "c"), "value"),
+                 (("data", "a", "b", "0", "c"), None),
+                 (("data", "a", "b", 1, "c"), None),
+                 (("data", "missing", "c"), None),
+                 (("custom", 1), "second"),
+                 (("service", ), "default"),
+                 (("missing", ), None)]
+        for scope, expected in cases:
+            self.assertEqual(next(EventFilter(event_scope=scope)._get_value(event, scope)), expected, scope)
+
+    def test_accessor_is_cached(self):
+        self.assertIs(EventFilter(event_scope=("data", "a")).scope_accessor, get_path_accessor(("data", "a"), ScopeAccessor))
+
+
+class TestFilterEngine(unittest.TestCase):
+
+    def assert_matches_filters(self, filters, events):
+        engine = FilterEngine(filters)
+        for event in events:
+            for _ in range(2):
+                # The second pass is answered from the remembered results
+                self.assertEqual(engine.matching_filters(event), [filter for filter in filters if filter.matches(event)])
+
+    def test_grouped_filters(self):
+        filters = [EventFilter(value_regexes=["^one$", "uno"]),
+                   EventFilter(value_regexes="t(wo|hree)"),
+                   EventFilter(value_regexes="(a)\\1"),
+                   EventFilter(value_regexes="(?i)ONE"),
+                   EventFilter(value_regexes="."),
+                   EventFilter(value_regexes=[]),
+                   EventFilter(value_regexes="default", event_scope=("service", )),
+                   EventFilter(value_regexes="x", event_scope=("missing", ))]
+        engine = FilterEngine(filters)
+        self.assertEqual(len(engine.groups), 3)
+        self.assertEqual(len(engine.individual), 3)
+
+        events = [Event(data=data) for data in ("one", "uno two", "three", "aa", "ONE", "", None, "x\none")]
+        self.assert_matches_filters(filters, events)
+
+    def test_conditional_group_filters(self):
+        filters = [EventFilter(value_regexes="t(wo)"),
+                   EventFilter(value_regexes="^(a)?(?(1)b|c)$"),
+                   EventFilter(value_regexes="^(?P<x>a)?(?(x)b|c)$")]
+        engine = FilterEngine(filters)
+        self.assertEqual(len(engine.groups), 1)
+        self.assertEqual(len(engine.individual), 2)
+
+        events = [Event(data=data) for data in ("ab", "c", "b", "two", "twoc")]
+        self.assert_matches_filters(filters, events)
+
+    def test_many_filters(self):
+        filters = [EventFilter(value_regexes="^value{0}$|(other){0}".format(index)) for index in range(200)]
+        engine = FilterEngine(filters)
+        self.assertGreater(len(engine.groups[0].patterns), 1)
+        events = [Event(data=data) for data in ("value0", "value199", "other150", "value200", "value1 other2")]
+        self.assert_matches_filters(filters, events)
+
+    def test_exact_and_prefix_filters(self):
+        filters = [EventExactFilter(values=["one", "two"]),
+                   EventExactFilter(values="one"),
+                   EventPrefixFilter(values=["on", "one-"]),
+                   EventPrefixFilter(values=""),
+                   EventExactFilter(values="default", event_scope=("service", )),
+                   EventFilter(value_regexes="^one")]
+        engine = FilterEngine(filters)
+        self.assertEqual(len(engine.groups), 4)
+        self.assertEqual(len(engine.individual), 0)
+
+        events = [Event(data=data) for data in ("one", "two", "one-two", "o", "", None, 1)]
+        self.assert_matches_filters(filters, events)
+
+
+class TestSimpleRouter(unittest.TestCase):
+
+    outbox_names = ["GET", "GET-v2", "POST", "default"]
+
+    def generate_actor(self, **actor_kwargs):
+        actor = SimpleRouter("simpleroutertest", scope="service", **actor_kwargs)
+        return TestActorWrapper(actor, output_queues=self.outbox_names, output_timeout=0.5)
+
+    def assert_routed(self, actor, service, outbox_names):
+        actor.input = Event(service=service)
+        for outbox_name in self.outbox_names:
+            if outbox_name in outbox_names:
+                self.assertIsInstance(actor.output_queues[outbox_name].get(block=True, timeout=1), Event)
+            else:
+                with self.assertRaises(QueueEmpty):
+                    actor.output_queues[outbox_name].get(block=True, timeout=.1)
+
+    def test_regex_mode(self):
+        actor = self.generate_actor()
+        self.assert_routed(actor, "GET-v2", ["GET", "GET-v2"])
+        self.assert_routed(actor, "PUT", ["default"])
+
+    def test_exact_mode(self):
+        actor = self.generate_actor(match_mode="exact")
+        self.assert_routed(actor, "GET-v2", ["GET-v2"])
+        self.assert_routed(actor, "GET", ["GET"])
+        self.assert_routed(actor, "GE", ["default"])
+
+    def test_prefix_mode(self):
+        actor = self.generate_actor(match_mode="prefix")
+        self.assert_routed(actor, "GET-v2/resource", ["GET", "GET-v2"])
+        self.assert_routed(actor, "POST", ["POST"])
+        self.assert_routed(actor, "-GET", ["default"])
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            SimpleRouter("simpleroutertest", match_mode="glob")
@@ -2,7 +2,7 @@ import json
 import unittest
 
 from compysition.actors.httpserver import HTTPServer
-from compysition.event import JSONHttpEvent, HttpEvent, XMLHttpEvent
+from compysition.event import JSONHttpEvent, HttpEvent, XMLHttpEvent, RawData
 from compysition.testutils.test_actor import TestActorWrapper
 
 class TestHTTPServer(unittest.TestCase):
@@ -80,3 +80,10 @@ class TestHTTPServer(unittest.TestCase):
         self.assertEqual(json.loads(output.body), expected)
 
 
+    def test_xml_event_raw_data_returned_unparsed(self):
+        _input_event = XMLHttpEvent(data=RawData('<honolulu>is blue blue</honolulu>'))
+        self.actor.actor.responders[_input_event.event_id] = (type(_input_event), self.actor._output_funnel)
+        self.actor.input = _input_event
+        output = self.actor.output
+        self.assertEqual(output.body, '<honolulu>is blue blue</honolulu>')
+        self.assertEqual(_input_event.raw_data, '<honolulu>is blue blue</honolulu>')
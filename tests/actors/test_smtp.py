@@ -0,0 +1,80 @@
+import unittest
+import smtplib
+
+from compysition.actors.smtp import SMTPOut
+from compysition.event import XMLEvent
+
+
+class MockSMTP(object):
+    """Fails to send to 'fail@test.com', after which the session is unusable until it is closed"""
+
+    sessions = []
+
+    def __init__(self, host):
+        self.sent = []
+        self.broken = False
+        self.closed = False
+        MockSMTP.sessions.append(self)
+
+    def sendmail(self, from_address, to, msg):
+        if self.broken:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if to == ["fail@test.com"]:
+            self.broken = True
+            raise smtplib.SMTPRecipientsRefused({"fail@test.com": (550, "Mailbox unavailable")})
+        self.sent.extend(to)
+
+    def quit(self):
+        if self.broken:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+class TestSMTPOut(unittest.TestCase):
+
+    def setUp(self):
+        MockSMTP.sessions = []
+        self.smtp = smtplib.SMTP
+        smtplib.SMTP = MockSMTP
+        self.sent_events = []
+        self.actor = SMTPOut("smtptest", from_address="sender@test.com")
+        self.actor.send_event = self.sent_events.append
+
+    def tearDown(self):
+        smtplib.SMTP = self.smtp
+
+    def create_event(self, to):
+        return XMLEvent(data="<email><To>{0}</To><From>sender</From><Body>body</Body></email>".format(to))
+
+    def test_consume_batch(self):
+        events = [self.create_event(to) for to in ("one@test.com", "two@test.com")]
+        self.actor.consume_batch(events)
+        self.assertEqual(len(MockSMTP.sessions), 1)
+        self.assertEqual(MockSMTP.sessions[0].sent, ["one@test.com", "two@test.com"])
+        self.assertTrue(MockSMTP.sessions[0].closed)
+        self.assertEqual(self.sent_events, events)
+
+    def test_consume_batch_failure(self):
+        events = [self.create_event(to) for to in ("one@test.com", "fail@test.com", "two@test.com", "three@test.com")]
+        self.actor.consume_batch(events)
+        self.assertEqual([session.sent for session in MockSMTP.sessions], [["one@test.com"], ["two@test.com", "three@test.com"]])
+        self.assertTrue(all(session.closed for session in MockSMTP.sessions))
+        self.assertEqual(self.sent_events, events)
+
+    def test_consume_batch_invalid_message(self):
+        self.actor = SMTPOut("smtptest", from_address="sender@test.com", rescue=True, max_rescue=1)
+        self.actor.send_event = self.sent_events.append
+        scheduled = []
+        self.actor.rescue_scheduler.schedule = lambda event, queue, attempt: scheduled.append(event) or True
+        errors = []
+        self.actor.send_error = errors.append
+        events = [XMLEvent(data="<email><Body>body</Body></email>"), self.create_event("one@test.com")]
+        self.actor.consume_batch(events, origin_queue=None)
+        # The invalid event is rescued as it would be by 'consume', the others are still sent
+        self.assertEqual(scheduled, events[:1])
+        self.assertEqual(errors, [])
+        self.assertEqual(self.sent_events, events[1:])
+        self.assertEqual(MockSMTP.sessions[0].sent, ["one@test.com"])
@@ -0,0 +1,58 @@
+import unittest
+
+from lxml import etree
+
+from compysition.actors.util.xpath import XPathLookup, document_scope
+
+
+class TestXPathLookup(unittest.TestCase):
+
+    def test_default_namespace(self):
+        xml = etree.fromstring('<root xmlns="urn:default"><child1><child2>value</child2></child1></root>')
+        results = XPathLookup(xml).lookup('/root/child1/child2')
+        self.assertEqual([result.text for result in results], ['value'])
+
+    def test_prefixed_namespace(self):
+        xml = etree.fromstring('<root xmlns:other="urn:other"><other:child>value</other:child></root>')
+        results = XPathLookup(xml).lookup('/root/other:child')
+        self.assertEqual([result.text for result in results], ['value'])
+
+    def test_no_namespace(self):
+        xml = etree.fromstring('<root><child id="1"/><child id="2"/></root>')
+        self.assertEqual(XPathLookup(xml).lookup('/root/child/@id'), ['1', '2'])
+
+    def test_compiled_xpath_is_cached(self):
+        xml = etree.fromstring('<root><child/></root>')
+        self.assertIs(XPathLookup(xml).compile('/root/child'), XPathLookup(etree.fromstring('<root/>')).compile('/root/child'))
+        namespaced = XPathLookup(etree.fromstring('<root xmlns="urn:default"/>'))
+        self.assertIsNot(namespaced.compile('/root/child'), XPathLookup(xml).compile('/root/child'))
+
+    def test_modified_document(self):
+        xml = etree.fromstring('<root><child/></root>')
+        self.assertEqual(XPathLookup(xml).namespaces, {})
+        etree.SubElement(xml, '{urn:added}child', nsmap={'added': 'urn:added'})
+        lookup = XPathLookup(xml)
+        self.assertEqual(lookup.namespaces, {'added': 'urn:added'})
+        self.assertEqual(len(lookup.lookup('/root/added:child')), 1)
+
+    def test_modified_namespaces(self):
+        xml = etree.fromstring('<root><child/></root>')
+        lookup = XPathLookup(xml)
+        lookup.namespaces['ns'] = 'urn:ns'
+        self.assertEqual(lookup.lookup('/root/ns:child'), [])
+
+    def test_modified_child_namespaces(self):
+        xml = etree.fromstring('<root><child/></root>')
+        self.assertEqual(XPathLookup(xml).namespaces, {})
+        xml.replace(xml[0], etree.Element('{urn:added}child', nsmap={'added': 'urn:added'}))
+        self.assertEqual(XPathLookup(xml).namespaces, {'added': 'urn:added'})
+
+    def test_document_scope(self):
+        xml = etree.fromstring('<root><child/></root>')
+        with document_scope():
+            self.assertEqual(XPathLookup(xml).namespaces, {})
+            # Lookups within the scope reuse the namespaces that were discovered first
+            xml.replace(xml[0], etree.Element('{urn:added}child', nsmap={'added': 'urn:added'}))
+            self.assertEqual(XPathLookup(xml).namespaces, {})
+            self.assertEqual(XPathLookup(etree.fromstring('<root xmlns="urn:other"/>')).namespaces, {'default': 'urn:other'})
+        self.assertEqual(XPathLookup(xml).namespaces, {'added': 'urn:added'})
@@ -6,10 +6,11 @@ import time
 from gevent.event import Event as GEvent
 
 from compysition.actor import Actor
-from compysition.event import Event
+from compysition.event import Event, JSONEvent, XMLEvent
 from compysition.queue import QueuePool, Queue
 from compysition.logger import Logger
 from compysition.restartlet import RestartPool
+from compysition.rescue import RescueScheduler
 from compysition.errors import (QueueConnected, InvalidActorOutput, QueueEmpty, InvalidEventConversion, 
     InvalidActorInput, QueueFull)
 
@@ -251,6 +252,17 @@ class TestActor(unittest.TestCase):
         self.assertEqual(actor._Actor__blocking_consume, False)
         self.assertEqual(actor.rescue, False)
         self.assertEqual(actor.max_rescue, 5)
+        self.assertIsInstance(actor.rescue_scheduler, RescueScheduler)
+        self.assertEqual(actor.rescue_scheduler.delay, 1)
+        self.assertEqual(actor.rescue_scheduler.backoff, 2)
+        self.assertEqual(actor.rescue_scheduler.max_delay, 60)
+        self.assertEqual(actor.rescue_scheduler.jitter, .5)
+        self.assertEqual(actor.rescue_scheduler.budget, 0)
+        self.assertEqual(actor.copy_on_write, False)
+        self.assertEqual(actor.max_in_flight, 0)
+        self.assertEqual(actor._Actor__in_flight, None)
+        self.assertEqual(actor.batch_size, 1)
+        self.assertEqual(actor.batch_timeout, 0)
 
         #test name parameter
         self.assertEqual(MockedActor.cleared_all, False)
@@ -959,6 +971,41 @@ class TestActor(unittest.TestCase):
         with self.assertRaises(TypeError):
             actor._loop_send(event=Event(), queues=object())
 
+    def test_loop_send_copy_on_write(self):
+        #test single queue passes the original event
+        actor = MockedActor('actor', copy_on_write=True)
+        actor._send = actor.mock_send
+        event = Event(data={"foo": "bar"})
+        actor._loop_send(event=event, queues=[1])
+        self.assertEqual(actor.sent, 1)
+        self.assertIs(actor._send_events[0], event)
+        self.assertIs(actor._send_events[0].data, event.data)
+
+        #test multiple queues share data until accessed
+        actor = MockedActor('actor', copy_on_write=True)
+        actor._send = actor.mock_send
+        event = Event(data={"foo": "bar"})
+        actor._loop_send(event=event, queues={"k1": 3, "k2": 10, "k3": 12})
+        self.assertEqual(actor.sent, 3)
+        self.assertIs(actor._send_events[0], event)
+        self.assertIsNot(actor._send_events[1], event)
+        self.assertIsNot(actor._send_events[2], event)
+        self.assertIs(actor._send_events[1]._data, event._data)
+        self.assertIs(actor._send_events[2]._data, event._data)
+        self.assertEqual(actor._send_events[0]._event_id, actor._send_events[1]._event_id)
+
+        actor._send_events[1].data["foo"] = "baz"
+        self.assertEqual(event.data, {"foo": "bar"})
+        self.assertEqual(actor._send_events[1].data, {"foo": "baz"})
+        self.assertIsNot(event.data, actor._send_events[2].data)
+        self.assertEqual(actor._send_events[2].data, {"foo": "bar"})
+
+        #test queues is other
+        actor = MockedActor('actor', copy_on_write=True)
+        actor._send = actor.mock_send
+        with self.assertRaises(TypeError):
+            actor._loop_send(event=Event(), queues=object())
+
     def test_send(self):
         #test adding event to queue
         actor = MockedActor('actor')
@@ -1225,6 +1272,96 @@ class TestActor(unittest.TestCase):
         with self.assertRaises(QueueEmpty):
             actor._Actor__get_queued_event(queue=queue)
 
+    def test_get_queued_batch(self):
+        #test batch limited by batch_size
+        actor = MockedActor('actor', batch_size=3)
+        queue = Queue('queue_name')
+        for i in range(5):
+            queue.put("mock_event_{0}".format(i))
+        events = actor._Actor__get_queued_batch(queue=queue)
+        self.assertEqual(events, ["mock_event_0", "mock_event_1", "mock_event_2"])
+        self.assertEqual(queue.qsize(), 2)
+
+        #test batch limited by waiting events
+        events = actor._Actor__get_queued_batch(queue=queue)
+        self.assertEqual(events, ["mock_event_3", "mock_event_4"])
+        self.assertEqual(queue.qsize(), 0)
+
+        #test batch waits for batch_timeout
+        actor = MockedActor('actor', batch_size=2, batch_timeout=3)
+        queue = Queue('queue_name')
+        queue.put("mock_event_0")
+        actor.threads.spawn(actor.mock_modify_content, queue=queue)
+        start = time.time()
+        events = actor._Actor__get_queued_batch(queue=queue)
+        dif = time.time() - start
+        self.assertEqual(events, ["mock_event_0", "mock_event"])
+        self.assertGreater(dif, 1)
+        self.assertGreater(3, dif)
+
+        #test empty queue
+        with self.assertRaises(QueueEmpty):
+            actor._Actor__get_queued_batch(queue=queue)
+
+    def test_do_consume_batch(self):
+        #test default consume_batch consumes events individually
+        actor = MockedActor('actor', batch_size=2)
+        queue = Queue('queue_name')
+        events = [Event(), Event()]
+        consumed = []
+        actor.consume = lambda event, *args, **kwargs: consumed.append(event)
+        actor._Actor__do_consume_batch(function=actor.consume_batch, events=events, queue=queue)
+        self.assertEqual(consumed, events)
+
+        #test default consume_batch converts and checks each event once
+        actor = MockedActor('actor', batch_size=2)
+        actor.logger = MockLogger()
+        actor.input = (JSONEvent,)
+        actor.REQUIRED_EVENT_ATTRIBUTES = ["meta_id"]
+        checked = []
+        get = JSONEvent.get
+        JSONEvent.get = lambda event, key, *args: checked.append(key) or get(event, key, *args)
+        consumed = []
+        actor.consume = lambda event, *args, **kwargs: consumed.append(event)
+        try:
+            actor._Actor__do_consume_batch(function=actor.consume_batch, events=[XMLEvent(data="<a/>"), XMLEvent(data="<b/>")], queue=queue)
+        finally:
+            JSONEvent.get = get
+        self.assertEqual([event.data for event in consumed], [{"a": None}, {"b": None}])
+        self.assertEqual(actor.logger.warned, 2)
+        self.assertEqual(checked, ["meta_id", "meta_id"])
+
+        #test consume_batch receives the whole batch
+        actor = MockedActor('actor', batch_size=2)
+        batches = []
+        actor._Actor__do_consume_batch(function=lambda events, *args, **kwargs: batches.append((events, kwargs)), events=events, queue=queue)
+        self.assertEqual(batches, [(events, {"origin": queue.name, "origin_queue": queue})])
+
+        #test invalid input is removed from the batch
+        actor = MockedActor('actor', batch_size=2)
+        actor.logger = MockLogger()
+        actor.REQUIRED_EVENT_ATTRIBUTES = ["some_attribute"]
+        events[0].set("some_attribute", True)
+        batches = []
+        actor._Actor__do_consume_batch(function=lambda events, *args, **kwargs: batches.append(events), events=events, queue=queue)
+        self.assertEqual(batches, [[events[0]]])
+        self.assertEqual(actor.logger.errored, 1)
+
+        #test exception errors every event of the batch
+        actor = MockedActor('actor', batch_size=2)
+        actor.send_error = actor.mock_send_error
+        actor.logger = MockLogger()
+        events = [Event(), Event()]
+
+        def raise_exception(events, *args, **kwargs):
+            raise MockException()
+
+        actor._Actor__do_consume_batch(function=raise_exception, events=events, queue=queue)
+        self.assertEqual(actor.send_error_event, events)
+        self.assertEqual(actor.logger.warned, 2)
+        for event in events:
+            self.assertIsInstance(event.error, MockException)
+
     def test_process_consumer_event(self):
         #test queue empty
         actor = MockedActor('actor')
@@ -1334,6 +1471,39 @@ class TestActor(unittest.TestCase):
         self.assertEqual(actor.did_consume, 3)
         self.assertEqual(len(actor.consumed_events), 3)
 
+    def test_process_consumer_event_max_in_flight(self):
+        #test consumer stops pulling events while all slots are busy
+        actor = MockedActor('actor', max_in_flight=2)
+        release = GEvent()
+
+        def blocked_do_consume(function, event, queue):
+            actor.consumed_events.append(event)
+            release.wait()
+
+        actor._Actor__do_consume = blocked_do_consume
+        queue = Queue('queue_name')
+        queue.put("mock_event_1")
+        queue.put("mock_event_2")
+        queue.put("mock_event_3")
+
+        consumer = gevent.spawn(lambda: [actor._Actor__process_consumer_event(function=None, queue=queue) for _ in range(3)])
+        gevent.sleep(.1)
+        self.assertEqual(actor.consumed_events, ["mock_event_1", "mock_event_2"])
+        self.assertEqual(queue.qsize(), 1)
+
+        release.set()
+        consumer.join(timeout=1)
+        gevent.sleep(0)
+        self.assertEqual(actor.consumed_events, ["mock_event_1", "mock_event_2", "mock_event_3"])
+        self.assertEqual(queue.qsize(), 0)
+
+        #test slot is released when the queue is empty
+        actor = MockedActor('actor', max_in_flight=1)
+        actor._Actor__do_consume = actor.mock_do_consume
+        queue = Queue('queue_name')
+        actor._Actor__process_consumer_event(function=None, queue=queue)
+        self.assertEqual(actor._Actor__in_flight.counter, 1)
+
     def test_do_consume(self):
         #test event in self.input does not have required attributes
         actor = MockedActor('actor')
@@ -1561,7 +1731,7 @@ class TestActor(unittest.TestCase):
         self.assertEqual(actor.logger.debuged, 0)
 
         #test Exception with rescue and less than max_rescue
-        actor = MockedActor('actor', rescue=True, max_rescue=2)
+        actor = MockedActor('actor', rescue=True, max_rescue=2, rescue_delay=.2, rescue_jitter=0)
         actor.send_error = actor.mock_send_error
         actor.logger = MockLogger()
         queue = Queue("some_queue")
@@ -1581,55 +1751,78 @@ class TestActor(unittest.TestCase):
         self.assertEqual(len(actor.send_error_event), 0)
         start = time.time()
         actor._Actor__do_consume(function=actor.consume, event=event, queue=queue)
-        end = time.time()
-        dif = end - start
+        dif = time.time() - start
+        # The consuming greenlet returns right away, the event waits in the rescue scheduler
+        self.assertGreater(.1, dif)
         self.assertEqual(actor.logger.warned, 1)
         self.assertEqual(actor.consumed, False)
-        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(queue.qsize(), 0)
+        self.assertEqual(len(actor.rescue_scheduler), 1)
         self.assertEqual(actor.logger.errored, 0)
-        self.assertEqual(actor.logger.warned, 1)
         self.assertEqual(actor.logger.infoed, 0)
         self.assertEqual(actor.logger.debuged, 0)
         self.assertEqual(event.get(rescue_attribute, 0), 1)
-        self.assertGreater(dif, .5)
-        self.assertGreater(1.5, dif)
+        self.assertEqual(len(actor.send_error_event), 0)
+        queue.wait_until_content()
+        dif = time.time() - start
+        self.assertGreater(dif, .15)
+        self.assertGreater(.35, dif)
         self.assertIs(queue.queue[0], event)
         self.assertIs(queue.qsize(), 1)
-        self.assertEqual(len(actor.send_error_event), 0)
+        self.assertEqual(len(actor.rescue_scheduler), 0)
+
+        # The second retry backs off exponentially
+        queue.get()
+        start = time.time()
         actor._Actor__do_consume(function=actor.consume, event=event, queue=queue)
-        end = time.time()
-        dif = end - start
         self.assertEqual(actor.consumed, False)
-        self.assertEqual(queue.qsize(), 2)
+        self.assertEqual(queue.qsize(), 0)
         self.assertEqual(actor.logger.errored, 0)
         self.assertEqual(actor.logger.warned, 2)
-        self.assertEqual(actor.logger.infoed, 0)
-        self.assertEqual(actor.logger.debuged, 0)
-        self.assertEqual(event.get(rescue_attribute, 0), 2)    
-        self.assertGreater(dif, 1.5)
-        self.assertGreater(2.5, dif)  
-        self.assertIs(queue.queue[1], event)
-        self.assertIs(queue.qsize(), 2)
+        self.assertEqual(event.get(rescue_attribute, 0), 2)
+        queue.wait_until_content()
+        dif = time.time() - start
+        self.assertGreater(dif, .35)
+        self.assertGreater(.55, dif)
+        self.assertIs(queue.queue[0], event)
+        self.assertIs(queue.qsize(), 1)
         self.assertEqual(len(actor.send_error_event), 0)
 
         #test Exception with rescue and greater than max_rescue
         self.assertEqual(event.get("error", None), None)
+        start = time.time()
         actor._Actor__do_consume(function=actor.consume, event=event, queue=queue)
-        end = time.time()
-        dif = end - start
+        dif = time.time() - start
+        self.assertGreater(.1, dif)
         self.assertEqual(actor.consumed, False)
-        self.assertEqual(queue.qsize(), 2)
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(len(actor.rescue_scheduler), 0)
         self.assertEqual(actor.logger.errored, 0)
         self.assertEqual(actor.logger.warned, 3)
         self.assertEqual(actor.logger.infoed, 0)
         self.assertEqual(actor.logger.debuged, 0)
-        self.assertEqual(event.get(rescue_attribute, 0), 2)    
-        self.assertGreater(dif, 1.5)
-        self.assertGreater(2.5, dif)  
+        self.assertEqual(event.get(rescue_attribute, 0), 2)
         self.assertEqual(len(actor.send_error_event), 1)
         self.assertIs(event, actor.send_error_event[0])
         self.assertNotEqual(actor.send_error_event[0].get("error", None), None)
 
+        #test Exception with rescue and an exhausted rescue budget
+        actor = MockedActor('actor', rescue=True, rescue_budget=1)
+        actor.send_error = actor.mock_send_error
+        actor.logger = MockLogger()
+        queue = Queue("some_queue")
+        actor.input = (MockEvent,)
+        events = [SubEvent(), SubEvent()]
+        for event in events:
+            event.convert = event.mock_convert
+            event.raise_reg_exception = True
+            actor._Actor__do_consume(function=actor.consume, event=event, queue=queue)
+        self.assertEqual(len(actor.rescue_scheduler), 1)
+        self.assertEqual(actor.logger.warned, 3)
+        self.assertEqual(len(actor.send_error_event), 1)
+        self.assertIs(events[1], actor.send_error_event[0])
+        self.assertNotEqual(events[1].get("error", None), None)
+
         #test Exception without rescue and less than max_rescue
         actor = MockedActor('actor', rescue=False, max_rescue=1)
         actor.send_error = actor.mock_send_error
@@ -1723,3 +1916,62 @@ class TestActor(unittest.TestCase):
                 pass
 
         ConsumeActor('actor')
+
+    def test_metrics(self):
+        class MetricsActor(Actor):
+            def consume(self, event, *args, **kwargs):
+                if event.data == "fail":
+                    raise MockException()
+                self.send_event(event)
+
+        actor = MetricsActor('actor')
+        actor.logger = MockLogger()
+        inbox = actor.pool.inbound.add("inbox")
+        outbox = actor.pool.outbound.add("outbox")
+        error = actor.pool.error.add("error")
+        for data in ("one", "two", "fail"):
+            inbox.put(Event(data=data))
+        inbox.put(Event(data="waiting"))
+        for _ in range(3):
+            actor._Actor__do_consume(function=actor.consume, event=inbox.get(), queue=inbox)
+
+        metrics = actor.metrics()
+        self.assertEqual(metrics["events_in"], 3)
+        self.assertEqual(metrics["events_out"], 2)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertEqual(metrics["rescues"], 0)
+        self.assertEqual(metrics["consume_time"]["count"], 3)
+        self.assertEqual(metrics["inbound_queues"]["inbox"]["depth"], 1)
+        self.assertEqual(metrics["inbound_queues"]["inbox"]["wait_time"]["count"], 3)
+        self.assertEqual(outbox.qsize(), 2)
+        self.assertEqual(error.qsize(), 1)
+
+    def test_metrics_batch(self):
+        #test the default consume_batch records every event once, and the batch as a single consume
+        actor = MockedActor('actor', batch_size=2)
+        actor.consume = lambda event, *args, **kwargs: None
+        queue = Queue('queue_name')
+        actor._Actor__do_consume_batch(function=actor.consume_batch, events=[Event(), Event()], queue=queue)
+        metrics = actor.metrics()
+        self.assertEqual(metrics["events_in"], 2)
+        self.assertEqual(metrics["consume_time"]["count"], 1)
+
+        #test an overridden consume_batch records the batch once
+        actor = MockedActor('actor', batch_size=2)
+        actor._Actor__do_consume_batch(function=lambda events, *args, **kwargs: None, events=[Event(), Event()], queue=queue)
+        metrics = actor.metrics()
+        self.assertEqual(metrics["events_in"], 2)
+        self.assertEqual(metrics["consume_time"]["count"], 1)
+
+        #test events dropped by the input checks are still counted in
+        actor = MockedActor('actor', batch_size=2)
+        actor.logger = MockLogger()
+        actor.consume = lambda event, *args, **kwargs: None
+        actor.REQUIRED_EVENT_ATTRIBUTES = ["some_attribute"]
+        events = [Event(), Event()]
+        events[0].set("some_attribute", True)
+        actor._Actor__do_consume_batch(function=actor.consume_batch, events=events, queue=queue)
+        metrics = actor.metrics()
+        self.assertEqual(metrics["events_in"], 2)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertEqual(metrics["consume_time"]["count"], 1)
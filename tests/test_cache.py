@@ -0,0 +1,32 @@
+import unittest
+
+from compysition.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        cache["c"] = 3
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("b", "missing"), "missing")
+
+    def test_replace(self):
+        cache = LRUCache(maxsize=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache["a"] = 3
+        cache["c"] = 4
+        self.assertEqual(cache.get("a"), 3)
+        self.assertNotIn("b", cache)
+
+    def test_clear(self):
+        cache = LRUCache()
+        cache["a"] = 1
+        cache.clear()
+        self.assertEqual(len(cache), 0)
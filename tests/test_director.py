@@ -118,6 +118,16 @@ class TestDirector(unittest.TestCase):
 	def test_is_running(self):
 		pass
 
+	def test_metrics(self):
+		# Skips __init__, as it registers signal handlers
+		director = MockDirector.__new__(MockDirector)
+		director.actors = {"actor": STDOUT("actor")}
+		director.log_actor = STDOUT("default_stdout")
+		director.error_actor = EventLogger("default_error_logger")
+		metrics = director.metrics()
+		self.assertEqual(sorted(metrics), ["actor", "default_error_logger", "default_stdout"])
+		self.assertEqual(metrics["actor"]["events_in"], 0)
+
 	def test_start(self):
 		pass
 
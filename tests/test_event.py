@@ -1,9 +1,19 @@
 import unittest
+import pickle
+import json
+import xmltodict
 
-from collections import Mapping
+from collections import Mapping, OrderedDict
+from decimal import Decimal
+from lxml import etree
+from xml.parsers import expat
 
-from compysition.errors import ResourceNotFound
-from compysition.event import HttpEvent, Event, CompysitionException, XMLEvent, JSONEvent
+from compysition.errors import ResourceNotFound, InvalidEventDataModification, InvalidEventConversion
+from compysition.event import (HttpEvent, Event, CompysitionException, XMLEvent, JSONEvent, LogEvent,
+    CounterIDGenerator, UUIDGenerator, set_id_generator, RawData, JSONHttpEvent, XMLHttpEvent, get_conversion_plan,
+    register_event_class, etree_to_dict, should_force_list, dict_to_etree,
+    EscapedText, is_embedded_xml, normalize_json, set_json_data_trusted, decimal_default,
+    StandardJSONCodec, SimpleJSONCodec, select_json_codec, get_json_codec, set_json_codec, get_path_accessor)
 
 
 class TestEvent(unittest.TestCase):
@@ -13,8 +23,446 @@ class TestEvent(unittest.TestCase):
     def test_distinct_meta_and_event_ids(self):
         self.assertNotEqual(self.event.event_id, self.event.meta_id)
 
+    def test_fork_shares_data_until_accessed(self):
+        forks = self.event.fork(copies=2)
+        self.assertEqual(len(forks), 2)
+        for fork in forks:
+            self.assertIsNot(fork, self.event)
+            self.assertIs(fork._data, self.event._data)
+            self.assertEqual(fork.event_id, self.event.event_id)
+
+        forks[0].data['foo'] = 'baz'
+        self.assertEqual(self.event.data, {'foo': 'bar'})
+        # The last remaining owner takes the data without copying it
+        shared_data = forks[1]._data
+        self.assertIs(forks[1].data, shared_data)
+
+    def test_fork_data_assignment(self):
+        fork = self.event.fork()[0]
+        fork.data = {'foo': 'baz'}
+        self.assertEqual(self.event.data, {'foo': 'bar'})
+        self.assertEqual(fork.data, {'foo': 'baz'})
+
+    def test_fork_properties_are_copied(self):
+        event = HttpEvent(data='quick brown fox')
+        fork = event.fork()[0]
+        fork.headers['foo'] = 'bar'
+        self.assertEqual(event.headers, {})
+        self.assertNotIn('_shared_data', fork.get_properties())
+
+    def test_kwargs_are_properties(self):
+        event = Event(data={'foo': 'bar'}, foo='bar')
+        self.assertEqual(event.foo, 'bar')
+        self.assertEqual(event.get('foo'), 'bar')
+        self.assertEqual(event.get_properties()['foo'], 'bar')
+        self.assertEqual(event.get_properties()['service'], 'default')
+        self.assertNotIn('_data', event.get_properties())
+
+    def test_pickle(self):
+        event = JSONEvent(data={'foo': 'bar'}, meta_id='123456abcdef', foo='bar')
+        unpickled = pickle.loads(pickle.dumps(event))
+        self.assertIsInstance(unpickled, JSONEvent)
+        self.assertEqual(unpickled.data, {'foo': 'bar'})
+        self.assertEqual(unpickled.get_properties(), event.get_properties())
+
+    def test_convert_keeps_properties(self):
+        event = JSONEvent(data={'foo': 'bar'}, foo='bar')
+        converted = event.convert(XMLEvent)
+        self.assertIsInstance(converted, XMLEvent)
+        self.assertEqual(converted.event_id, event.event_id)
+        self.assertEqual(converted.foo, 'bar')
+        self.assertEqual(converted.data_string(), '<foo>bar</foo>')
+
+
+class TestLookup(unittest.TestCase):
+    class Item(object):
+        attribute = {"key": "attribute value"}
+
+    def setUp(self):
+        self.event = JSONEvent(data={"a": {"b": [1, {"c": "value"}], 1: "int key", "none": None}}, custom={"list": [5, 6]})
+
+    def test_lookup(self):
+        cases = [("service", "default"),
+                 ("missing", None),
+                 (["data", "a", "b", "1", "c"], "value"),
+                 (["data", "a", "b", 1, "c"], "value"),
+                 (["data", "a", "b", "-1", "c"], "value"),
+                 (["data", "a", "b", "2"], None),
+                 (["data", "a", "b", "x"], None),
+                 (["data", "a", "1"], "int key"),
+                 (["data", "a", "none"], None),
+                 (["data", "a", "none", "x"], None),
+                 (["data", "missing", "x", "y"], None),
+                 (["custom", "list", "0"], 5)]
+        for path, expected in cases:
+            self.assertEqual(self.event.lookup(path), expected, path)
+
+    def test_generic_objects(self):
+        self.event.data = {"element": None}
+        self.event.data["item"] = self.Item()
+        self.event.data["element"] = etree.fromstring('<root id="1"/>')
+        self.assertEqual(self.event.lookup(["data", "item", "attribute", "key"]), "attribute value")
+        self.assertEqual(self.event.lookup(["data", "element", "id"]), "1")
+        self.assertEqual(self.event.lookup(["data", "element", "tag"]), "root")
+
+    def test_accessor_is_cached(self):
+        self.assertIs(get_path_accessor(["data", "a"]), get_path_accessor(("data", "a")))
+        self.assertIs(get_path_accessor("data"), get_path_accessor("data"))
+
+
+class TestConversion(unittest.TestCase):
+    def test_conversion_plan(self):
+        self.assertEqual(get_conversion_plan(Event, XMLEvent), (XMLEvent, False))
+        self.assertEqual(get_conversion_plan(HttpEvent, JSONEvent), (JSONHttpEvent, False))
+        self.assertEqual(get_conversion_plan(XMLEvent, XMLHttpEvent), (XMLHttpEvent, True))
+        self.assertIs(get_conversion_plan(HttpEvent, JSONEvent), get_conversion_plan(HttpEvent, JSONEvent))
+
+    def test_narrowing_conversion(self):
+        with self.assertRaises(InvalidEventConversion):
+            XMLHttpEvent().convert(XMLEvent)
+
+    def test_same_format_keeps_data(self):
+        event = JSONEvent(data={'foo': 'bar'})
+        converted = event.convert(JSONHttpEvent)
+        self.assertIsInstance(converted, JSONHttpEvent)
+        self.assertIs(converted.data, event.data)
+
+        event = XMLEvent(data=RawData('<foo>bar</foo>'))
+        self.assertEqual(event.convert(XMLHttpEvent).raw_data, '<foo>bar</foo>')
+
+    def test_convert_back_unchanged(self):
+        event = XMLEvent(data='<foo>bar</foo>')
+        element = event.data
+        converted = event.convert(JSONEvent)
+        self.assertEqual(converted.get_properties(), event.get_properties())
+        self.assertIs(converted.convert(XMLEvent)._data, element)
+        self.assertIs(converted.convert(JSONHttpEvent).convert(XMLEvent)._data, element)
+
+    def test_convert_back_modified(self):
+        event = XMLEvent(data='<foo>bar</foo>')
+        converted = event.convert(JSONEvent)
+        converted.data['foo'] = 'baz'
+        self.assertEqual(converted.convert(XMLEvent).data_string(), '<foo>baz</foo>')
+
+        converted = event.convert(JSONEvent)
+        converted.data = {'foo': 'baz'}
+        self.assertEqual(converted.convert(XMLEvent).data_string(), '<foo>baz</foo>')
+
+    def test_convert_back_after_copy(self):
+        event = XMLEvent(data='<foo>bar</foo>')
+        element = event.data
+        converted = event.convert(JSONEvent)
+        for copy in (converted.clone(), pickle.loads(pickle.dumps(converted)), converted.fork(1)[0]):
+            self.assertEqual(copy.convert(XMLEvent).data_string(), '<foo>bar</foo>')
+
+        # Copies share the data in the previous format, only pickles serialize it
+        self.assertIs(converted.clone().convert(XMLEvent)._data, element)
+        self.assertEqual(pickle.loads(pickle.dumps(converted)).convert(XMLEvent).raw_data, '<foo>bar</foo>')
+        self.assertNotIn('_alternate_data', converted.clone()._get_copy_state())
+        self.assertEqual(XMLEvent(data='<foo>bar</foo>').clone().convert(JSONEvent).data, {'foo': 'bar'})
+        self.assertEqual(str(converted), str(converted.clone()))
+
+    def test_convert_back_raw(self):
+        converted = pickle.loads(pickle.dumps(XMLEvent(data='<foo>bar</foo>').convert(JSONEvent)))
+        converted = pickle.loads(pickle.dumps(converted))
+        self.assertEqual(converted.raw_data, '{"foo": "bar"}')
+        self.assertEqual(converted.convert(XMLEvent).raw_data, '<foo>bar</foo>')
+        # Neither format was parsed to convert back
+        self.assertEqual(converted.raw_data, '{"foo": "bar"}')
+
+    def test_convert_back_source_modified(self):
+        event = XMLEvent(data='<foo>bar</foo>')
+        converted = event.convert(JSONEvent)
+        event.data.text = 'baz'
+        self.assertEqual(converted.convert(XMLEvent).data_string(), '<foo>bar</foo>')
+
+        event = XMLEvent(data='<foo>bar</foo>')
+        converted = event.convert(JSONEvent)
+        converted.convert(XMLEvent).data.text = 'baz'
+        self.assertEqual(event.data_string(), '<foo>bar</foo>')
+        self.assertEqual(converted.convert(XMLEvent).data_string(), '<foo>bar</foo>')
+
+    def test_register_event_class(self):
+        class CustomEvent(Event):
+            pass
+
+        with self.assertRaises(InvalidEventConversion):
+            CustomEvent().convert(JSONEvent)
+
+        @register_event_class
+        class JSONCustomEvent(JSONEvent, CustomEvent):
+            pass
+
+        converted = CustomEvent(data={'foo': 'bar'}).convert(JSONEvent)
+        self.assertIsInstance(converted, JSONCustomEvent)
+        self.assertEqual(converted.data, {'foo': 'bar'})
+
+
+class TestEtreeToDict(unittest.TestCase):
+    def assert_matches_xmltodict(self, xml):
+        expected = xmltodict.parse(xml, expat=expat, force_list=should_force_list)
+        result = etree_to_dict(etree.fromstring(xml), force_list=should_force_list)
+        self.assertEqual(result.items(), expected.items())
+        self.assertEqual(self.typed_values(result), self.typed_values(expected))
+
+    def typed_values(self, item):
+        """The keys of item's mappings in order, with the type of each value"""
+        if isinstance(item, Mapping):
+            return [(key, self.typed_values(value)) for key, value in item.iteritems()]
+        if isinstance(item, list):
+            return [self.typed_values(value) for value in item]
+        return type(item), item
+
+    def test_elements(self):
+        self.assert_matches_xmltodict("<a><b>1</b><b>2</b><c/><d> text </d></a>")
+
+    def test_attributes(self):
+        self.assert_matches_xmltodict("<a x='1'><b y='2'>text</b><b/></a>")
+
+    def test_mixed_content(self):
+        self.assert_matches_xmltodict("<a>  head <b>1</b> tail <!-- comment --> more</a>")
+
+    def test_namespaces(self):
+        self.assert_matches_xmltodict("<a xmlns='urn:a' xmlns:p='urn:p' p:x='1'><p:b>1</p:b><c xmlns:q='urn:q'><q:d/></c></a>")
+
+    def test_namespace_declaration_order(self):
+        self.assert_matches_xmltodict("<root xmlns:z='urn:z' xmlns:a='urn:a' xmlns='urn:d' a:x='1'>"
+                                      "<z:b xmlns:y='urn:y' xmlns:b='urn:b'>1</z:b></root>")
+        self.assert_matches_xmltodict(u"<root xmlns:z='urn:z' xmlns:a='urn:a'>\xe9<a:b x='\xe9'/></root>".encode('utf-8'))
+
+    def test_ascii_values(self):
+        self.assert_matches_xmltodict("<a x='1'><b>text</b><c y='2'>1</c> tail</a>")
+
+    def test_force_list(self):
+        self.assert_matches_xmltodict("<a><b force_list='True'><c>1</c></b></a>")
+        self.assertEqual(JSONEvent(data={}).conversion_methods[etree._Element](etree.fromstring("<a><b force_list='True'>1</b></a>")),
+                         {'a': {'b': [{'#text': '1'}]}})
+
+    def test_jsonified_envelope(self):
+        self.assertEqual(XMLEvent(data='<jsonified_envelope><a>1</a></jsonified_envelope>').convert(JSONEvent).data, {'a': '1'})
+
+
+class TestDictToEtree(unittest.TestCase):
+    def assert_matches_xmltodict(self, data):
+        expected = etree.tostring(etree.fromstring(xmltodict.unparse(data).encode('utf-8')))
+        self.assertEqual(etree.tostring(dict_to_etree(data)), expected)
+
+    def test_elements(self):
+        self.assert_matches_xmltodict({u'a': OrderedDict([(u'b', [1, 2]), (u'c', None), (u'd', True), (u'e', u'x & y')])})
+
+    def test_attributes(self):
+        self.assert_matches_xmltodict({u'a': OrderedDict([(u'@x', 1), (u'b', OrderedDict([(u'@y', u'2'), (u'#text', u'text')])), (u'#text', u'tail')])})
+
+    def test_namespaces(self):
+        self.assert_matches_xmltodict({u'p:a': OrderedDict([(u'@xmlns', u'urn:a'), (u'@xmlns:p', u'urn:p'), (u'@p:x', u'1'), (u'p:b', u'1'), (u'c', None)])})
+        with self.assertRaises(ValueError):
+            dict_to_etree({u'p:a': None})
+
+    def test_embedded_xml(self):
+        self.assert_matches_xmltodict({u'a': OrderedDict([(u'b', u'<c><d>embedded</d></c>'), (u'e', u'  <f/><!-- comment -->')])})
+        self.assert_matches_xmltodict({u'a': OrderedDict([(u'b', u'<c>not embedded'), (u'e', u'<f/><g/>')])})
+
+    def test_embedded_xml_detection(self):
+        self.assertTrue(is_embedded_xml(u' <a><b/></a> '))
+        self.assertTrue(is_embedded_xml(u'<!-- comment --><a/>'))
+        for text in (u'', u'text', u'<a>', u'<b>bold</b> text', u'<p>a</p><p>b</p>', u'<?xml version="1.0"?><a/>'):
+            self.assertFalse(is_embedded_xml(text))
+            self.assertFalse(is_embedded_xml(text))
+
+    def test_escaped_text(self):
+        self.assertTrue(is_embedded_xml(u'<a/>'))
+        self.assertFalse(is_embedded_xml(EscapedText(u'<a/>')))
+        self.assertEqual(etree.tostring(dict_to_etree({u'a': OrderedDict([(u'b', u'<c/>'), (u'd', EscapedText(u'<c/>'))])})),
+                         '<a><b><c/></b><d>&lt;c/&gt;</d></a>')
+        self.assertEqual(xmltodict.unparse({u'a': u'<c/>'}, full_document=False), '<a><c/></a>')
+
+    def test_multiple_roots(self):
+        with self.assertRaises(ValueError):
+            dict_to_etree({u'a': [1, 2]})
+        with self.assertRaises(ValueError):
+            dict_to_etree({u'a': 1, u'b': 2})
+
+    def test_jsonified_envelope(self):
+        self.assertEqual(JSONEvent(data=[{'a': 1}, {'a': 2}]).convert(XMLEvent).data_string(),
+                         '<jsonified_envelope><jsonified_envelope><a>1</a></jsonified_envelope>'
+                         '<jsonified_envelope><a>2</a></jsonified_envelope></jsonified_envelope>')
+
+
+class TestNormalizeJSON(unittest.TestCase):
+    def test_matches_round_trip(self):
+        data = {'a': 1, 1: 2, None: 3, 1.5: 4, 'b': [1L, (2, 3), Decimal('1.5'), '\xc3\xa9', u'y', None, True, 2.5]}
+        normalized = normalize_json(data)
+        self.assertEqual(normalized, json.loads(json.dumps(data, default=decimal_default)))
+        self.assertEqual(normalized['b'][2].__class__, float)
+        self.assertEqual(normalized['b'][3].__class__, unicode)
+
+    def test_copies(self):
+        value = {'b': [1]}
+        event = JSONEvent(data={'a': value})
+        event.data['a']['b'].append(2)
+        self.assertEqual(value, {'b': [1]})
+
+    def test_keeps_order_and_text_markers(self):
+        normalized = normalize_json(OrderedDict([('z', EscapedText(u'<a/>')), ('a', 1)]))
+        self.assertEqual(normalized.keys(), [u'z', u'a'])
+        self.assertEqual(normalized['z'].__class__, EscapedText)
+
+    def test_rejects_invalid_data(self):
+        with self.assertRaises(TypeError):
+            normalize_json({'a': object()})
+        with self.assertRaises(TypeError):
+            normalize_json({(1,): 1})
+        with self.assertRaises(InvalidEventDataModification):
+            JSONEvent(data={'a': set()})
+
+    def test_trusted(self):
+        set_json_data_trusted(True)
+        try:
+            data = {'a': Decimal('1.5')}
+            event = JSONEvent(data=data)
+            self.assertIs(event.data, data)
+            self.assertEqual(event.data_string(), '{"a": 1.5}')
+        finally:
+            set_json_data_trusted(False)
+
+
+class TestJSONCodec(unittest.TestCase):
+    """Every codec must encode the bodies we respond with exactly as the stdlib does"""
+
+    bodies = [
+        {"data": {"id": 1, "name": u"caf\xe9", "amount": Decimal("10.10"), "ratio": 0.1, "big": 10 ** 20, "flags": [True, False, None]}},
+        {"errors": [{"message": "Malformed data: \"quoted\" </script>\n\ttab", "code": None}]},
+        {"data": [{"id": index, "values": (1.5, 1e100, -0.0, 2L)} for index in range(3)], "_pagination": {"prev": "/a?limit=1&offset=0"}},
+        OrderedDict([("z", 1), ("a", OrderedDict([("y", "\xc3\xa9"), ("b", u"\u2603")]))]),
+        [],
+        u"plain",
+    ]
+
+    codecs = [StandardJSONCodec, SimpleJSONCodec]
+
+    def get_codecs(self):
+        for codec in self.codecs:
+            try:
+                yield codec()
+            except ImportError:
+                pass
+
+    def test_dumps_conformance(self):
+        for codec in self.get_codecs():
+            for body in self.bodies:
+                self.assertEqual(codec.dumps(body), json.dumps(body, default=decimal_default), codec.name)
+
+    def test_loads_conformance(self):
+        for codec in self.get_codecs():
+            for body in self.bodies:
+                data = json.dumps(body, default=decimal_default)
+                self.assertEqual(codec.loads(data), json.loads(data), codec.name)
+            self.assertEqual(codec.loads('{"a": "b"}')["a"].__class__, unicode)
+
+    def test_rejects_invalid_data(self):
+        for codec in self.get_codecs():
+            with self.assertRaises(TypeError):
+                codec.dumps({"a": object()})
+
+    def test_select(self):
+        class Missing(StandardJSONCodec):
+            def __init__(self):
+                raise ImportError()
+
+        self.assertIsInstance(select_json_codec((Missing, StandardJSONCodec)), StandardJSONCodec)
+        self.assertIsInstance(select_json_codec((Missing,)), StandardJSONCodec)
+
+    def test_set_codec(self):
+        class UpperCodec(StandardJSONCodec):
+            def dumps(self, data):
+                return super(UpperCodec, self).dumps(data).upper()
+
+        codec = get_json_codec()
+        set_json_codec(UpperCodec())
+        try:
+            self.assertEqual(JSONEvent(data={"a": "b"}).data_string(), '{"A": "B"}')
+        finally:
+            set_json_codec(codec)
+
+
+class TestRawData(unittest.TestCase):
+    def test_parsed_on_access(self):
+        event = JSONEvent(data=RawData('{"foo": "bar"}'))
+        self.assertEqual(event.raw_data, '{"foo": "bar"}')
+        self.assertEqual(event.data, {'foo': 'bar'})
+        self.assertEqual(event.raw_data, None)
+
+    def test_serialized_unparsed(self):
+        event = XMLEvent(data=RawData('<foo>  <bar/></foo>'))
+        self.assertEqual(event.data_string(), '<foo>  <bar/></foo>')
+        unpickled = pickle.loads(pickle.dumps(event))
+        self.assertEqual(event.raw_data, '<foo>  <bar/></foo>')
+        self.assertEqual(unpickled.raw_data, '<foo>  <bar/></foo>')
+        self.assertEqual(unpickled.data.tag, 'foo')
+
+    def test_malformed_raised_on_access(self):
+        event = XMLEvent(data=RawData('<foo>'))
+        with self.assertRaises(InvalidEventDataModification):
+            event.data
+
+    def test_fork(self):
+        event = JSONEvent(data=RawData('{"foo": "bar"}'))
+        fork = event.fork()[0]
+        fork.data['foo'] = 'baz'
+        self.assertEqual(event.data, {'foo': 'bar'})
+
+
+class TestIDGenerator(unittest.TestCase):
+    def tearDown(self):
+        set_id_generator(CounterIDGenerator())
+
+    def test_counter_ids_are_unique(self):
+        generator = CounterIDGenerator()
+        ids = [generator() for _ in range(1000)]
+        self.assertEqual(len(set(ids)), 1000)
+        for _id in ids:
+            self.assertEqual(len(_id), 32)
+            int(_id, 16)
+
+    def test_counter_prefix_per_generator(self):
+        self.assertNotEqual(CounterIDGenerator()()[:16], CounterIDGenerator()()[:16])
+
+    def test_uuid_ids(self):
+        generator = UUIDGenerator()
+        self.assertEqual(len(generator()), 32)
+        self.assertNotEqual(generator(), generator())
+
+    def test_set_id_generator(self):
+        set_id_generator(lambda: 'some_id')
+        self.assertEqual(Event().event_id, 'some_id')
+        self.assertEqual(LogEvent('info', 'actor', 'message').event_id, 'some_id')
+
 
 class TestHttpEvent(unittest.TestCase):
+    def test_headers_created_on_access(self):
+        event = HttpEvent(data='quick brown fox')
+        event.headers['foo'] = 'bar'
+        self.assertEqual(event.headers, {'foo': 'bar'})
+        self.assertEqual(HttpEvent(headers={'foo': 'bar'}).headers, {'foo': 'bar'})
+
+    def test_headers_not_created_by_copies(self):
+        event = HttpEvent(data='<foo/>')
+        copies = event.fork(2) + [event.clone(), pickle.loads(pickle.dumps(event)), event.convert(XMLHttpEvent)]
+        for copy in [event] + copies:
+            with self.assertRaises(AttributeError):
+                copy._headers
+        self.assertEqual(copies[0].headers, {})
+
+        event.headers['foo'] = 'bar'
+        self.assertEqual([copy.headers for copy in event.fork(1) + [event.clone()]], [{'foo': 'bar'}] * 2)
+
+    def test_pickle(self):
+        event = HttpEvent(data='quick brown fox', headers={'foo': 'bar'}, status=(404, 'Not Found'))
+        unpickled = pickle.loads(pickle.dumps(event))
+        self.assertEqual(unpickled.headers, {'foo': 'bar'})
+        self.assertEqual(unpickled.status, (404, 'Not Found'))
+        self.assertEqual(unpickled.data, 'quick brown fox')
+
     def test_default_status(self):
         self.event = HttpEvent(data='quick brown fox')
         self.assertEquals(self.event.status, (200, 'OK'))
@@ -0,0 +1,48 @@
+import unittest
+
+from compysition.metrics import Histogram, RateCounter
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_bucket_bounds(self):
+        histogram = Histogram(precision=4)
+        for value in range(1, 100000, 7):
+            histogram.counts = {}
+            histogram.record(value / 1000000.0)
+            histogram.flush()
+            lower, upper = histogram.bucket_bounds(next(iter(histogram.counts)))
+            self.assertLessEqual(lower, value)
+            self.assertLess(value, upper)
+            self.assertLessEqual(upper - lower, max(1, value / 8))
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value / 1000.0)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 1000)
+        self.assertEqual(snapshot["min"], .001)
+        self.assertEqual(snapshot["max"], 1)
+        self.assertAlmostEqual(snapshot["mean"], .5005)
+        for percentile, expected in ((50, .5), (90, .9), (99, .99), (99.9, .999)):
+            self.assertAlmostEqual(histogram.percentile(percentile), expected, delta=expected / 16)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().snapshot(), {"count": 0, "min": None, "max": None, "mean": None,
+                                                  "p50": None, "p90": None, "p99": None, "p99_9": None})
+
+
+class TestRateCounter(unittest.TestCase):
+
+    def test_rate(self):
+        counter = RateCounter(window=10)
+        for second in range(100, 120):
+            counter.add(amount=second % 2 + 1, now=second + .5)
+
+        self.assertEqual(counter.total, 30)
+        # Seconds 110 to 119, excluding the current second 120
+        self.assertEqual(counter.rate(now=120.5), 1.5)
+        self.assertEqual(counter.rate(now=125), .8)
+        self.assertEqual(counter.rate(now=200), 0)
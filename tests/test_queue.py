@@ -0,0 +1,94 @@
+import unittest
+import gevent
+
+from compysition.queue import Queue, QueuePool
+from compysition.errors import QueueFull
+
+
+class TestQueue(unittest.TestCase):
+
+    def test_wait_until_free(self):
+        queue = Queue("queue_name", maxsize=1)
+        queue.put("some_event")
+        with self.assertRaises(QueueFull):
+            queue.put("some_other_event", block=False)
+
+        waiter = gevent.spawn(queue.wait_until_free)
+        gevent.sleep(.1)
+        self.assertFalse(waiter.ready())
+
+        queue.get()
+        waiter.join(timeout=1)
+        self.assertTrue(waiter.successful())
+
+    def test_wait_until_free_unbounded(self):
+        queue = Queue("queue_name")
+        queue.put("some_event")
+        waiter = gevent.spawn(queue.wait_until_free)
+        waiter.join(timeout=1)
+        self.assertTrue(waiter.successful())
+
+    def test_wait_until_empty(self):
+        queue = Queue("queue_name")
+        queue.put("some_event")
+        queue.put("some_other_event")
+
+        waiter = gevent.spawn(queue.wait_until_empty)
+        gevent.sleep(.1)
+        self.assertFalse(waiter.ready())
+
+        queue.get()
+        gevent.sleep(.1)
+        self.assertFalse(waiter.ready())
+
+        queue.get()
+        waiter.join(timeout=1)
+        self.assertTrue(waiter.successful())
+
+    def test_wait_until_empty_handed_off_put(self):
+        queue = Queue("queue_name", maxsize=1)
+        queue.put("some_event")
+        putter = gevent.spawn(queue.put, "some_other_event", block=True)
+        gevent.sleep(.1)
+
+        # The blocked putter's event is added to the queue as soon as the first event is removed
+        queue.get()
+        gevent.sleep(0)
+        self.assertEqual(queue.qsize(), 1)
+        waiter = gevent.spawn(queue.wait_until_empty)
+        gevent.sleep(.1)
+        self.assertFalse(waiter.ready())
+
+        queue.get()
+        waiter.join(timeout=1)
+        self.assertTrue(waiter.successful())
+        self.assertTrue(putter.successful())
+
+    def test_metrics(self):
+        queue = Queue("queue_name", maxsize=5)
+        queue.put("some_event")
+        queue.put("some_other_event")
+        gevent.sleep(.05)
+        queue.get()
+
+        metrics = queue.metrics()
+        self.assertEqual(metrics["depth"], 1)
+        self.assertEqual(metrics["maxsize"], 5)
+        self.assertEqual(metrics["wait_time"]["count"], 1)
+        self.assertGreaterEqual(metrics["wait_time"]["min"], .05)
+
+
+class TestQueuePool(unittest.TestCase):
+
+    def test_join(self):
+        pool = QueuePool()
+        queue = pool.outbound.add("outbox")
+        queue.put("some_event")
+
+        waiter = gevent.spawn(pool.join)
+        gevent.sleep(.1)
+        self.assertFalse(waiter.ready())
+
+        queue.get()
+        waiter.join(timeout=1)
+        self.assertTrue(waiter.successful())
@@ -0,0 +1,64 @@
+import unittest
+import time
+import gevent
+
+from compysition.rescue import RescueScheduler
+from compysition.queue import Queue
+
+
+class TestRescueScheduler(unittest.TestCase):
+
+    def test_get_delay(self):
+        scheduler = RescueScheduler(delay=1, backoff=2, max_delay=5, jitter=0)
+        self.assertEqual(scheduler.get_delay(1), 1)
+        self.assertEqual(scheduler.get_delay(2), 2)
+        self.assertEqual(scheduler.get_delay(3), 4)
+        self.assertEqual(scheduler.get_delay(4), 5)
+
+    def test_get_delay_jitter(self):
+        scheduler = RescueScheduler(delay=1, backoff=2, jitter=.5)
+        for _ in range(100):
+            delay = scheduler.get_delay(2)
+            self.assertGreaterEqual(delay, 1)
+            self.assertGreaterEqual(2, delay)
+
+    def test_schedule_order(self):
+        scheduler = RescueScheduler(delay=.1, backoff=2, jitter=0)
+        queue = Queue("queue_name")
+        start = time.time()
+        self.assertTrue(scheduler.schedule("late_event", queue, attempt=2))
+        self.assertTrue(scheduler.schedule("early_event", queue, attempt=1))
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(queue.qsize(), 0)
+
+        queue.wait_until_content()
+        self.assertGreater(time.time() - start, .05)
+        self.assertEqual(queue.get(), "early_event")
+        queue.wait_until_content()
+        self.assertGreater(time.time() - start, .15)
+        self.assertEqual(queue.get(), "late_event")
+        self.assertEqual(len(scheduler), 0)
+
+    def test_schedule_budget(self):
+        scheduler = RescueScheduler(delay=.1, jitter=0, budget=1)
+        queue = Queue("queue_name")
+        self.assertTrue(scheduler.schedule("some_event", queue))
+        self.assertFalse(scheduler.schedule("some_other_event", queue))
+        self.assertEqual(len(scheduler), 1)
+
+        queue.wait_until_content()
+        self.assertTrue(scheduler.schedule("some_other_event", queue))
+
+    def test_schedule_full_queue(self):
+        scheduler = RescueScheduler(delay=.1, jitter=0)
+        queue = Queue("queue_name", maxsize=1)
+        queue.put("some_event")
+        scheduler.schedule("rescued_event", queue)
+        gevent.sleep(.15)
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(len(scheduler), 1)
+
+        queue.get()
+        gevent.sleep(.15)
+        self.assertEqual(queue.get(), "rescued_event")
+        self.assertEqual(len(scheduler), 0)